@@ -37,13 +37,13 @@ if __name__ == '__main__':
 
 # In[3]:
 
-  designs = ty.Designs("../../ioc-0/data/pv_residential_simple")
+  designs = ty.Designs("../../ioc-0/data/pv_residential_simple", name=None)
 
 
 # In[4]:
 
 
-  investments = ty.Investments("../../ioc-0/data/pv_residential_simple")
+  investments = ty.Investments("../../ioc-0/data/pv_residential_simple", name=None, workbook=designs.workbook)
 
 
 # ### Compile the production and metric functions for each technology in the dataset.
@@ -67,7 +67,12 @@ if 'QUART_APP' in os.environ or __name__ == '__main__':
 
   investments = ty.Investments(app.config["INVESTMENTS"])
 
-  designs = ty.Designs(app.config["DESIGNS"])
+  # Share the workbook session only when both datasets are in the same file.
+  designs_path = os.path.join(app.config["DESIGNS"], "technology.xlsx")
+  if os.path.realpath(designs_path) == os.path.realpath(investments.workbook.fpath):
+    designs = ty.Designs(app.config["DESIGNS"], workbook=investments.workbook)
+  else:
+    designs = ty.Designs(app.config["DESIGNS"])
   designs.compile()
 
   tranche_results = investments.evaluate_tranches(designs, sample_count=100)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Checks of the sampling and evaluation of a dataset.
+
+Run this script with the location of a dataset, which defaults to the one in
+the example script; it exits with an error message if any check fails.
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(".."))
+
+import numpy as np
+import tyche as ty
+
+
+def check_sampling_independence(designs, technology, sample_count=4096, sampling="sobol", seed=0, tolerance=0.1):
+  """
+  Check that the arrays sampled for a technology are uncorrelated with each other.
+
+  Parameters
+  ----------
+  designs : tyche.Designs
+    The compiled designs, with `uncertain` set.
+  technology : str
+    The technology.
+  sample_count : int
+    The number of samples.
+  sampling : str
+    The sampling mode, one of `tyche.Distributions.SAMPLINGS`.
+  seed : int
+    The seed.
+  tolerance : float
+    The largest allowed magnitude of the correlation between cells of different arrays.
+
+  Returns
+  -------
+  float
+    The largest magnitude of the correlation between cells of different arrays.
+  """
+  scenario_count = designs.vectorize_scenarios(technology).shape[0]
+  design    = designs.vectorize_designs(   technology, scenario_count, sample_count, sampling, seed)
+  parameter = designs.vectorize_parameters(technology, scenario_count, sample_count, sampling, seed)
+  arrays = list(design) + [parameter]
+
+  rows = np.concatenate([np.reshape(array, (-1, sample_count)) for array in arrays])
+  labels = np.repeat(np.arange(len(arrays)), [np.size(array) // sample_count for array in arrays])
+
+  # Constant cells have no correlation with anything.
+  varying = np.std(rows, axis=1) > 0
+  rows = rows[varying]
+  labels = labels[varying]
+
+  correlation = np.corrcoef(rows) if rows.shape[0] > 1 else np.ones((rows.shape[0], rows.shape[0]))
+  across = labels[:, np.newaxis] != labels[np.newaxis, :]
+  worst = np.max(np.abs(correlation[across]), initial=0)
+  if worst > tolerance:
+    sys.exit(f"Correlation {worst:.3f} between arrays of {technology} with {sampling} sampling exceeds {tolerance}.")
+  return worst
+
+
+def check_uncertain_tranches(designs, investments, sample_count=50, seed=0):
+  """
+  Check that treating constant tranche amounts as uncertain does not change the metrics of the tranches.
+
+  Parameters
+  ----------
+  designs : tyche.Designs
+    The compiled designs.
+  investments : tyche.Investments
+    The investments, whose tranche amounts are constant.
+  sample_count : int
+    The number of samples.
+  seed : int
+    The seed, so that both evaluations use the same samples of the designs.
+  """
+  uncertain = investments.uncertain
+  try:
+    investments.uncertain = False
+    certain_results = investments.evaluate_tranches(designs, sample_count, seed=seed)
+    investments.uncertain = True
+    uncertain_results = investments.evaluate_tranches(designs, sample_count, seed=seed)
+  finally:
+    investments.uncertain = uncertain
+  if not np.allclose(uncertain_results.summary["Value"], certain_results.summary["Value"], equal_nan=True):
+    sys.exit("Summaries of tranches with uncertain and fixed amounts disagree.")
+
+
+if __name__ == '__main__':
+
+  path = sys.argv[1] if len(sys.argv) > 1 else "../../ioc-0/data/pv_residential_simple"
+
+  designs = ty.Designs(path, name=None)
+  designs.compile()
+
+  investments = ty.Investments(path, name=None, workbook=designs.workbook)
+  check_uncertain_tranches(designs, investments)
+  print("Tranches: uncertain and fixed amounts agree")
+
+  for technology in designs.vectorize_technologies():
+    for sampling in ["lhs", "sobol"]:
+      worst = check_sampling_independence(designs, technology, sampling=sampling)
+      print(f"{technology}, {sampling}: largest correlation between arrays {worst:.3f}")
@@ -10,6 +10,7 @@ Unmodified FPEAM code is available at https://github.com/NREL/fpeam.
 
 @author: rhanes
 """
+import os
 import sys
 import pandas as pd
 
@@ -28,6 +29,12 @@ class Data(pd.DataFrame):
 
   INDEX_COLUMNS = []
 
+  TABLE_FORMATS = {
+    ".csv"    : "csv"    ,
+    ".tsv"    : "tsv"    ,
+    ".parquet": "parquet",
+  }
+
   def __init__(
     self,
     fpath,
@@ -64,7 +71,7 @@ class Data(pd.DataFrame):
 
     super().__init__(data=_df)
 
-    self.source = fpath
+    self.source = None if isinstance(fpath, pd.DataFrame) else fpath
 
     _valid = self.validate()
 
@@ -81,16 +88,62 @@ class Data(pd.DataFrame):
           self.backfill(column=_column["name"], value=_column["backfill"])
 
   @staticmethod
-  def load(fpath, columns, index_columns=None, header=0, sheet=None):
+  def table_format(fpath):
     """
-    Load data from a text file at <fpath>. Check and set column names.
+    Identify the format of a data file from its extension.
 
-    See pandas.read_table() help for additional arguments.
+    Parameters
+    ----------
+    fpath: [string]
+        file path to the data file
+
+    Returns
+    -------
+    One of "csv", "tsv", "parquet", or "excel"
+    """
+    _, _extension = os.path.splitext(str(fpath))
+    return Data.TABLE_FORMATS.get(_extension.lower(), "excel")
+
+  @staticmethod
+  def locate(fpath, sheet):
+    """
+    Find the file for a table in a directory of per-table files.
 
     Parameters
     ----------
     fpath: [string]
-        file path to CSV file or SQLite database file
+        file path to the directory
+
+    sheet: [str]
+        name of the table, which is the file name without its extension
+
+    Returns
+    -------
+    File path to the table
+    """
+    for _extension in Data.TABLE_FORMATS.keys():
+      _fpath = os.path.join(fpath, sheet + _extension)
+      if os.path.isfile(_fpath):
+        return _fpath
+    print(f"DataManager: No file for {sheet} found in {fpath}")
+    raise FileNotFoundError(os.path.join(fpath, sheet))
+
+  @staticmethod
+  def load(fpath, columns, index_columns=None, header=0, sheet=None):
+    """
+    Load data from a file at <fpath>. Check and set column names.
+
+    The format is detected from <fpath>: a directory holds one CSV, TSV, or
+    Parquet file per table, named after <sheet>; a file with a .csv, .tsv, or
+    .parquet extension holds a single table; any other file is a workbook.
+
+    See pandas.read_excel() and pandas.read_csv() help for additional arguments.
+
+    Parameters
+    ----------
+    fpath: [string, pandas.ExcelFile, or DataFrame]
+        file path to XLSX file, CSV/TSV/Parquet file, or directory of
+        such files, an already opened workbook, or an already parsed table
 
     columns: [dict]
         {name: type, ...}
@@ -99,22 +152,52 @@ class Data(pd.DataFrame):
         0-based row index containing column names
 
     sheet: [str]
-        Specify the name of the sheet to be read in.
-        If no sheet name is provided, the first sheet is read.
+        Specify the name of the sheet, or of the file in a directory, to be
+        read in. If no sheet name is provided, the first sheet is read.
 
     Returns
     -------
     DataFrame
     """
+    if isinstance(fpath, pd.DataFrame):
+      return Data.coerce(fpath, columns=columns, index_columns=index_columns)
+
+    if isinstance(fpath, (str, os.PathLike)) and os.path.isdir(fpath):
+      fpath = Data.locate(fpath, sheet)
+
+    _format = "excel" if isinstance(fpath, pd.ExcelFile) else Data.table_format(fpath)
+
     try:
-      _df = pd.read_excel(
-        io = fpath,
-        sheet_name = sheet,
-        dtype = columns,
-        usecols = columns.keys(),
-        index_col = index_columns,
-        header = header,
-      )
+      if _format == "excel":
+        _df = pd.read_excel(
+          io = fpath,
+          sheet_name = sheet,
+          dtype = columns,
+          usecols = columns.keys(),
+          index_col = index_columns,
+          header = header,
+        )
+      elif _format == "parquet":
+        _df = Data.coerce(
+          pd.read_parquet(
+            path = fpath,
+            columns = list(columns.keys()),
+          ),
+          columns = columns,
+          index_columns = index_columns,
+        )
+      else:
+        _df = Data.coerce(
+          pd.read_csv(
+            fpath,
+            sep = "\t" if _format == "tsv" else ",",
+            dtype = columns,
+            usecols = list(columns.keys()),
+            header = header,
+          ),
+          columns = columns,
+          index_columns = index_columns,
+        )
     except ValueError as _e:
       print(f"DataManager: Unexpected column(s) found in {fpath}, {sheet}")
       raise _e
@@ -122,6 +205,52 @@ class Data(pd.DataFrame):
     else:
       return _df
 
+  @staticmethod
+  def coerce(frame, columns, index_columns=None):
+    """
+    Check and set column names and types for an already parsed table.
+
+    Parameters
+    ----------
+    frame: [DataFrame]
+        table with the columns as columns or index levels
+
+    columns: [dict]
+        {name: type, ...}
+
+    index_columns: [list of int]
+        0-based positions in <columns> to use as row labels
+
+    Returns
+    -------
+    DataFrame
+    """
+    _df = frame if frame.index.names == [None] else frame.reset_index()
+
+    _missing = [_c for _c in columns.keys() if _c not in _df.columns]
+    if len(_missing) != 0:
+      print(f"DataManager: Missing column(s) {_missing}")
+      raise ValueError(f"Missing column(s) {_missing}")
+
+    _df = _df[list(columns.keys())].copy()
+    for _column, _type in columns.items():
+      if _type is str:
+        # Leave missing values as NaN, like pandas.read_excel does, in an
+        # object column even if every value is missing, as Parquet reads
+        # such columns as floats.
+        _df[_column] = _df[_column].astype(object).where(
+          _df[_column].isna(),
+          _df[_column].astype(str),
+        )
+      else:
+        _df[_column] = _df[_column].astype(_type)
+
+    if index_columns:
+      _names = list(columns.keys())
+      _df = _df.set_index([_names[_i] for _i in index_columns])
+
+    return _df
+
   def backfill(self, column, value=0):
     """
     Replace NaNs in <column> with <value>.
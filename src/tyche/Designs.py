@@ -4,50 +4,19 @@ Designs for technologies.
 
 import os
 import sys
+import concurrent.futures as cf
+import hashlib   as hl
 import importlib as il
 import numpy     as np
 import pandas    as pd
+import scipy.stats as st
 
-from .DataManager   import DesignsDataset, FunctionsDataset, IndicesDataset, ParametersDataset, ResultsDataset
-from .Distributions import parse_distribution
-from .IO            import check_tables
-from .Types         import Functions, Indices, Inputs, Results
-
-
-def sampler(x, sample_count):
-  """
-  Sample from an array.
-
-  Parameters
-  ----------
-  x : array
-    The array.
-  sample_count : int
-    The sample size.
-  """
-
-  if sample_count == 1:
-    it = np.nditer(
-      [x, np.empty(x.shape + (1,), dtype=np.float64)],
-      flags=["refs_ok"],
-      op_flags=[["readonly"], ["writeonly", "allocate"]],
-      op_axes=[list(range(x.ndim)) + [-1], None],
-      itershape=x.shape+(1,)
-    )
-    for x, y in it:
-     y[()] = x[()].rvs()
-    return it.operands[1]
-  else:
-    it = np.nditer(
-      [x, np.empty(x.shape + (sample_count,), dtype=np.float64)],
-      flags=["refs_ok", "external_loop"],
-      op_flags=[["readonly"], ["writeonly", "allocate"]],
-      op_axes=[list(range(x.ndim)) + [-1], None],
-      itershape=x.shape+(sample_count,)
-    )
-    for x, y in it:
-      y[...] = x[0].rvs(sample_count)
-    return it.operands[1]
+from .Distributions import label_key, parse_distributions, sampler, seed_label, stream, uniforms
+from .Ensembles     import Ensemble
+from .IO            import ResultCache, Workbook
+from .Profiling     import NO_PROFILE
+from .Statistics    import OnlineStatistics, choose_block_size
+from .Types         import Functions, Gather, Indices, Inputs, Plan, Results
 
 
 class Designs:
@@ -66,6 +35,8 @@ class Designs:
     The *parameters* table.
   results : DataFrame
     The *results* table.
+  distributions : dict
+    The compiled distribution for each distinct expression in the *designs* and *parameters* tables.
   """
 
   def __init__(
@@ -73,6 +44,10 @@ class Designs:
     path       = None            ,
     name       = 'technology.xlsx',
     uncertain  = True           ,
+    workbook     = None            ,
+    cache        = True            ,
+    result_cache = None            ,
+    profiler     = None            ,
   ):
     """
     Parameters
@@ -80,7 +55,7 @@ class Designs:
     path : str
       Location of the data files.
     name : str
-        Filename where decision context datasets are kept in separate sheets.
+        Filename where decision context datasets are kept in separate sheets, or directory where they are kept in separate CSV, TSV, or Parquet files. If None, *path* is that directory.
     uncertain : Boolean
       Flag indicating whether probability distributions are present in the *designs* or *parameters* tables.
     indices : str
@@ -93,20 +68,36 @@ class Designs:
       Sheet name for the *parameters* table.
     results : str
       Sheet name for the *results* table.
+    workbook : tyche.IO.Workbook
+      Session over the data file to share with other objects, such as *Investments*, so that its sheets are parsed only once.
+    cache : Boolean
+      Flag indicating whether to read and write the binary cache of the validated data file.
+    result_cache : tyche.IO.ResultCache
+      On-disk cache in which to memoize the results of seeded evaluations, or None to always recompute them.
+    profiler : tyche.Profiling.Profiler
+      Profiler to record the time and memory of each stage of evaluation, or None to not profile.
     """
-    self.uncertain = uncertain
-
-    if not os.path.isfile(os.path.join(path, name)):
-      raise Exception(f"Designs: {os.path.join(path, name)} does not exist.")
+    self.uncertain    = uncertain
+    self.result_cache = result_cache
+    self.profiler     = profiler
+    self.compilations = 0
+
+    fpath = path if name is None else os.path.join(path, name)
+    if not os.path.exists(fpath):
+      raise Exception(f"Designs: {fpath} does not exist.")
+
+    if workbook is None:
+      workbook = Workbook(fpath, cache=cache)
+    self.workbook = workbook
     
-    if not check_tables(path, name):
-      raise Exception(f'Designs: {name} failed validation.')
+    if not workbook.validate():
+      raise Exception(f'Designs: {path if name is None else name} failed validation.')
 
-    self.indices    = IndicesDataset(    os.path.join(path, name)).sort_index()
-    self.functions  = FunctionsDataset(  os.path.join(path, name)).sort_index()
-    self.designs    = DesignsDataset(    os.path.join(path, name)).sort_index()
-    self.parameters = ParametersDataset( os.path.join(path, name)).sort_index()
-    self.results    = ResultsDataset(    os.path.join(path, name)).sort_index()
+    self.indices    = workbook["indices"   ].sort_index()
+    self.functions  = workbook["functions" ].sort_index()
+    self.designs    = workbook["designs"   ].sort_index()
+    self.parameters = workbook["parameters"].sort_index()
+    self.results    = workbook["results"   ].sort_index()
 
       
   def vectorize_technologies(self):
@@ -158,23 +149,88 @@ class Designs:
       metric  = vectors.metric.index.values ,
     )
   
-  def vectorize_designs(self, technology, scenario_count, sample_count=1):
+  def vectorize_designs(self, technology, scenario_count, sample_count=1, sampling="random", seed=None, scenarios=None, points=None):
     """
     Make an array of designs.
     """
 
+    plan = self._select_plan(technology, scenarios)
+
+    # If the technology model has probability distributions, sample them;
+    # otherwise, just sample once to get floats and then broadcast the data,
+    # without copying it, for later merging with the tranche samples.
+    count = sample_count if self.uncertain else 1
+
+    if points is None and sampling != "random":
+      points, _ = self._points(plan, technology, count, sampling, seed)
+
+    def sample(variable, gather, u):
+      samples = sampler(
+        self.design_distributions[gather.positions],
+        count,
+        sampling,
+        stream(seed, technology, variable),
+        gather.keys,
+        u,
+      )
+      return samples if self.uncertain else np.broadcast_to(samples, samples.shape[:-1] + (sample_count,))
+
+    if points is None:
+      points = Inputs(*[None for _ in plan.designs])
+
+    return Inputs(
+      scale             = sample("Scale"            , plan.designs.scale            , points.scale            ),
+      lifetime          = sample("Lifetime"         , plan.designs.lifetime         , points.lifetime         ),
+      input             = sample("Input"            , plan.designs.input            , points.input            ),
+      input_efficiency  = sample("Input efficiency" , plan.designs.input_efficiency , points.input_efficiency ),
+      input_price       = sample("Input price"      , plan.designs.input_price      , points.input_price      ),
+      output_efficiency = sample("Output efficiency", plan.designs.output_efficiency, points.output_efficiency),
+      output_price      = sample("Output price"     , plan.designs.output_price     , points.output_price     ),
+    )
+
+  
+  def vectorize_parameters(self, technology, scenario_count, sample_count=1, sampling="random", seed=None, scenarios=None, points=None):
+    """
+    Make an array of parameters.
+    """
+
+    plan = self._select_plan(technology, scenarios)
+    if points is None and sampling != "random":
+      _, points = self._points(plan, technology, sample_count, sampling, seed)
+    return sampler(
+      self.parameter_distributions[plan.parameters.positions],
+      sample_count,
+      sampling,
+      stream(seed, technology, "Parameter"),
+      plan.parameters.keys,
+      points,
+    )
+
+  def _points(self, plan, technology, sample_count, sampling, seed):
+    # Draw one Latin hypercube or Sobol design for every cell of a technology
+    # and split its dimensions among the arrays of designs and parameters.
+    # Separate designs for each array would repeat the same leading
+    # dimensions, correlating the arrays with each other.
+    gathers = list(plan.designs) + [plan.parameters]
+    sizes = [gather.positions.size for gather in gathers]
+    u = uniforms(sum(sizes), sample_count, sampling, stream(seed, technology, "Design"))
+    points = [
+      block.reshape(gather.positions.shape + (sample_count,))
+      for block, gather in zip(np.split(u, np.cumsum(sizes)[:-1]), gathers)
+    ]
+    return Inputs(*points[:-1]), points[-1]
+
+  def _plan(self, technology):
+    # Locate the cells of the arrays for a technology in the flat arrays of
+    # distributions, so that evaluations skip the index work.
+    scenarios = self.vectorize_scenarios(technology)
+    scenario_count = scenarios.shape[0]
+
     def extract_designs(variable):
       return self.compiled_designs.xs(
         (technology, variable),
         level=["Technology", "Variable"]
-      )[["Distribution"]]
-    lifetimes           = extract_designs("Lifetime"         )
-    scales              = extract_designs("Scale"            )
-    inputs              = extract_designs("Input"            )
-    input_efficiencies  = extract_designs("Input efficiency" )
-    input_prices        = extract_designs("Input price"      )
-    output_efficiencies = extract_designs("Output efficiency")
-    output_prices       = extract_designs("Output price"     )
+      )[["Position"]]
   
     all_indices = self._vectorize_indices(technology)
   
@@ -186,58 +242,88 @@ class Designs:
       ).reset_index(
       ).sort_values(
         by=["Offset", "Scenario"]
-      )[
-        "Distribution"
-      ].values.reshape(
-        (offsets.shape[0], scenario_count)
       )
 
-    # If the technology model has probability distributions, sample them
-    if self.uncertain:
-      return Inputs(
-        scale             = sampler(scales["Distribution"].values                 , sample_count),
-        lifetime          = sampler(join(lifetimes          , all_indices.capital), sample_count),
-        input             = sampler(join(inputs             , all_indices.input  ), sample_count),
-        input_efficiency  = sampler(join(input_efficiencies , all_indices.input  ), sample_count),
-        input_price       = sampler(join(input_prices       , all_indices.input  ), sample_count),
-        output_efficiency = sampler(join(output_efficiencies, all_indices.output ), sample_count),
-        output_price      = sampler(join(output_prices      , all_indices.output ), sample_count),
+    def gather(frame, shape, label):
+      keys = np.array(
+        [label_key(scenario, index) for scenario, index in zip(frame["Scenario"], frame[label])],
+        dtype=np.uint64,
       )
-    else:
-      # Otherwise, just sample once to get floats and then duplicate the data for later merging
-      # with the tranche samples
-      return Inputs(
-        scale             = np.tile(sampler(scales["Distribution"].values                 , 1), sample_count),
-        lifetime          = np.tile(sampler(join(lifetimes          , all_indices.capital), 1), sample_count),
-        input             = np.tile(sampler(join(inputs             , all_indices.input  ), 1), sample_count),
-        input_efficiency  = np.tile(sampler(join(input_efficiencies , all_indices.input  ), 1), sample_count),
-        input_price       = np.tile(sampler(join(input_prices       , all_indices.input  ), 1), sample_count),
-        output_efficiency = np.tile(sampler(join(output_efficiencies, all_indices.output ), 1), sample_count),
-        output_price      = np.tile(sampler(join(output_prices      , all_indices.output ), 1), sample_count),
+      return Gather(
+        positions = frame["Position"].values.reshape(shape),
+        keys      = keys.reshape(shape)                     ,
       )
 
-  
-  def vectorize_parameters(self, technology, scenario_count, sample_count=1):
-    """
-    Make an array of parameters.
-    """
+    def locate(variable, offsets=None):
+      values = extract_designs(variable)
+      if offsets is None:
+        return gather(values.reset_index(), (scenario_count,), "Index")
+      return gather(join(values, offsets), (offsets.shape[0], scenario_count), "Index")
 
-    x = self.compiled_parameters.xs(
+    parameters = self.compiled_parameters.xs(
       technology
-    ).reset_index(
+    )[["Offset", "Position"]].reset_index(
     ).sort_values(
       by=["Offset", "Scenario"]
-    )["Distribution"].values
-    return sampler(
-      x.reshape((-1, scenario_count)),
-      sample_count
+    )
+
+    return Plan(
+      scenarios  = scenarios,
+      indices    = self.vectorize_indices(technology),
+      designs    = Inputs(
+        scale             = locate("Scale"                                 ),
+        lifetime          = locate("Lifetime"         , all_indices.capital),
+        input             = locate("Input"            , all_indices.input  ),
+        input_efficiency  = locate("Input efficiency" , all_indices.input  ),
+        input_price       = locate("Input price"      , all_indices.input  ),
+        output_efficiency = locate("Output efficiency", all_indices.output ),
+        output_price      = locate("Output price"     , all_indices.output ),
+      ),
+      parameters = gather(parameters, (-1, scenario_count), "Parameter"),
     )
   
+  def _select_plan(self, technology, scenarios=None):
+    # Restrict the plan for a technology to some of its scenarios, keeping
+    # their order; the streams of the cells are unchanged.
+    plan = self.plans[technology]
+    if scenarios is None:
+      return plan
+    positions = np.flatnonzero(np.isin(plan.scenarios, np.asarray(scenarios, dtype=object)))
+
+    def select(gather):
+      return Gather(
+        positions = gather.positions[..., positions],
+        keys      = gather.keys[..., positions]     ,
+      )
+
+    return Plan(
+      scenarios  = plan.scenarios[positions],
+      indices    = plan.indices,
+      designs    = Inputs(*[select(gather) for gather in plan.designs]),
+      parameters = select(plan.parameters),
+    )
+
+  def _select_scenarios(self, scenarios):
+    # The scenarios to evaluate for each technology, from either scenario
+    # names or (technology, scenario) pairs.
+    if scenarios is None:
+      return {technology : None for technology in self.plans}
+    scenarios = list(scenarios)
+    pairs = [scenario for scenario in scenarios if isinstance(scenario, tuple)]
+    selected = {}
+    for technology, plan in self.plans.items():
+      names = [scenario for t, scenario in pairs if t == technology] if len(pairs) > 0 else scenarios
+      names = plan.scenarios[np.isin(plan.scenarios, np.asarray(names, dtype=object))]
+      if names.shape[0] > 0:
+        selected[technology] = names
+    return selected
+
   def compile(self):
     """
     Compile the production and metrics functions.
     """
 
+    self.compilations += 1
     self.compiled_functions = {}
     for technology, metadata in self.functions.iterrows():
       m = il.import_module("." + metadata["Model"], package="technology")
@@ -249,13 +335,49 @@ class Designs:
         metric     = eval("m." + metadata["Metrics"   ]),
       )
 
+    # Parse each distinct expression once, sharing the objects between tables.
+    self.distributions = {}
+
     self.compiled_designs = self.designs.copy()
-    self.compiled_designs["Distribution"] = self.compiled_designs["Value"].apply(parse_distribution)
+    self.compiled_designs["Distribution"] = parse_distributions(self.compiled_designs["Value"], self.distributions)
 
     self.compiled_parameters = self.parameters.copy()
-    self.compiled_parameters["Distribution"] = self.compiled_parameters["Value"].apply(parse_distribution)
+    self.compiled_parameters["Distribution"] = parse_distributions(self.compiled_parameters["Value"], self.distributions)
+
+    # Flat arrays of the distributions, with the vectorization plan for each
+    # technology gathering its arrays from them by position.
+    self.compiled_designs["Position"] = np.arange(self.compiled_designs.shape[0])
+    self.compiled_parameters["Position"] = np.arange(self.compiled_parameters.shape[0])
+    self.design_distributions = self.compiled_designs["Distribution"].values
+    self.parameter_distributions = self.compiled_parameters["Distribution"].values
+    self.plans = {
+      technology : self._plan(technology)
+      for technology in self.vectorize_technologies()
+    }
+    self._fingerprints = {}
+
+  def count_distributions(self):
+    """
+    Count the cells and the distinct distribution expressions in the compiled *designs* and *parameters* tables.
+    """
+
+    return pd.DataFrame(
+      {
+        "Cells"   : [
+          self.compiled_designs.shape[0],
+          self.compiled_parameters.shape[0],
+          self.compiled_designs.shape[0] + self.compiled_parameters.shape[0],
+        ],
+        "Distinct": [
+          self.compiled_designs["Value"].nunique(),
+          self.compiled_parameters["Value"].nunique(),
+          len(self.distributions),
+        ],
+      },
+      index = pd.Index(["designs", "parameters", "all"], name="Table"),
+    )
           
-  def evaluate(self, technology, sample_count=1):
+  def evaluate(self, technology, sample_count=1, sampling="random", seed=None, scenarios=None, cache=True):
     """
     Evaluate the performance of a technology.
 
@@ -265,36 +387,20 @@ class Designs:
       The name of the technology.
     sample_count : int
       The number of random samples.
+    sampling : str
+      How to sample the distributions: "random" for independent pseudo-random draws, "lhs" for Latin hypercube samples, or "sobol" for scrambled Sobol points (best with a power-of-two sample count).
+    seed : int or numpy.random.SeedSequence
+      Seed for reproducible sampling, or None to use numpy's global random state. Random streams are derived from the seed for each technology, variable, scenario, and index, so the samples for a technology do not depend on which other technologies are evaluated, or in what order.
+    scenarios : sequence of str
+      The scenarios to evaluate, or None for all of the technology's scenarios. With "random" sampling, a scenario's samples do not depend on which other scenarios are evaluated.
+    cache : Boolean
+      Flag indicating whether to use the result cache, if there is one, for a seeded evaluation.
     """
-    print(f"Evaluating {technology}")
-    f_capital    = self.compiled_functions[technology].capital
-    f_fixed      = self.compiled_functions[technology].fixed        
-    f_production = self.compiled_functions[technology].production
-    f_metrics    = self.compiled_functions[technology].metric
-    
-    indices = self.vectorize_indices(technology)
-    
-    scenarios = self.vectorize_scenarios(technology)
-    n = scenarios.shape[0]
-    
-    design    = self.vectorize_designs(   technology, n, sample_count)
-    parameter = self.vectorize_parameters(technology, n, sample_count)
-
-    capital_cost = f_capital(design.scale, parameter)
-    fixed_cost   = f_fixed  (design.scale, parameter)
+    result = self._evaluate_results(technology, sample_count, sampling, seed, scenarios, cache)
 
-    input_raw = design.input
-    input = design.input_efficiency * input_raw
-    
-    output_raw = f_production(design.scale, capital_cost, design.lifetime, fixed_cost, input, parameter)
-    output = design.output_efficiency * output_raw
-
-    cost = np.sum(capital_cost / design.lifetime, axis=0) / design.scale + \
-           np.sum(fixed_cost, axis=0) / design.scale +                     \
-           np.sum(design.input_price  * input , axis=0) -                  \
-           np.sum(design.output_price * output, axis=0)
-
-    metric = f_metrics(design.scale, capital_cost, design.lifetime, fixed_cost, input_raw, input, design.input_price, output_raw, output, cost, parameter)
+    plan      = self._select_plan(technology, scenarios)
+    indices   = plan.indices
+    scenarios = plan.scenarios
     
     def organize(df, ix):
       ix1 = pd.MultiIndex.from_product(
@@ -310,14 +416,86 @@ class Designs:
         ["Technology", "Scenario", "Sample", "Index"]
       ).sort_index()
 
-    return Results(
-      cost   = organize(cost.reshape(cost.shape + (1,)), ["Cost"]      ),
-      output = organize(output                         , indices.output),
-      metric = organize(metric                         , indices.metric),
+    with self._stage(technology, "organize") as stage:
+      organized = Results(
+        cost   = organize(result.cost  , ["Cost"]      ),
+        output = organize(result.output, indices.output),
+        metric = organize(result.metric, indices.metric),
+      )
+    self._annotate(stage, *organized)
+    return organized
+
+  def _stage(self, technology, name):
+    # Record a stage of evaluation with the profiler, if there is one.
+    if self.profiler is None:
+      return NO_PROFILE
+    return self.profiler.stage(technology, name)
+
+  def _annotate(self, stage, *arrays):
+    if stage is not None:
+      self.profiler.annotate(stage, *arrays)
+
+  def _evaluate_arrays(self, technology, scenario_count, sample_count, sampling="random", seed=None, scenarios=None):
+    # Sample the inputs for a technology and evaluate its model, returning
+    # the inputs and the results as arrays indexed by (index, scenario, sample).
+    f_capital    = self.compiled_functions[technology].capital
+    f_fixed      = self.compiled_functions[technology].fixed        
+    f_production = self.compiled_functions[technology].production
+    f_metrics    = self.compiled_functions[technology].metric
+
+    # A deterministic model is evaluated for a single sample, whose results
+    # are broadcast along the sample axis as read-only views.
+    count = sample_count if self.uncertain else 1
+    
+    with self._stage(technology, "sample") as stage:
+      points = (None, None)
+      if sampling != "random":
+        points = self._points(self._select_plan(technology, scenarios), technology, count, sampling, seed)
+      design    = self.vectorize_designs(   technology, scenario_count, count, sampling, seed, scenarios, points[0])
+      parameter = self.vectorize_parameters(technology, scenario_count, count, sampling, seed, scenarios, points[1])
+    self._annotate(stage, *design, parameter)
+
+    with self._stage(technology, "capital") as stage:
+      capital_cost = f_capital(design.scale, parameter)
+    self._annotate(stage, capital_cost)
+
+    with self._stage(technology, "fixed") as stage:
+      fixed_cost   = f_fixed  (design.scale, parameter)
+    self._annotate(stage, fixed_cost)
+
+    with self._stage(technology, "production") as stage:
+      input_raw = design.input
+      input = design.input_efficiency * input_raw
+    
+      output_raw = f_production(design.scale, capital_cost, design.lifetime, fixed_cost, input, parameter)
+      output = design.output_efficiency * output_raw
+    self._annotate(stage, input, output_raw, output)
+
+    with self._stage(technology, "cost") as stage:
+      cost = np.sum(capital_cost / design.lifetime, axis=0) / design.scale + \
+             np.sum(fixed_cost, axis=0) / design.scale +                     \
+             np.sum(design.input_price  * input , axis=0) -                  \
+             np.sum(design.output_price * output, axis=0)
+    self._annotate(stage, cost)
+
+    with self._stage(technology, "metric") as stage:
+      metric = f_metrics(design.scale, capital_cost, design.lifetime, fixed_cost, input_raw, input, design.input_price, output_raw, output, cost, parameter)
+    self._annotate(stage, metric)
+
+    result = Results(
+      cost   = cost.reshape((1,) + cost.shape),
+      output = output,
+      metric = metric,
     )
+    if count != sample_count:
+      result = Results(*[
+        np.broadcast_to(values, values.shape[:-1] + (sample_count,))
+        for values in result
+      ])
+    return design, parameter, result
 
       
-  def evaluate_scenarios(self, sample_count=1):
+  def evaluate_scenarios(self, sample_count=1, sampling="random", seed=None, executor=None, n_jobs=None, scenarios=None):
     """
     Evaluate scenarios.
 
@@ -325,19 +503,45 @@ class Designs:
     ----------
     sample_count : int
       The number of random samples.
+    sampling : str
+      How to sample the distributions: "random", "lhs", or "sobol".
+    seed : int or numpy.random.SeedSequence
+      Seed for reproducible sampling, or None to use numpy's global random state.
+    executor : concurrent.futures.Executor
+      Executor, such as a ProcessPoolExecutor, in which to evaluate each technology. The designs must be picklable for a process pool.
+    n_jobs : int
+      Number of worker processes to evaluate the technologies in, if no executor is given; -1 uses every processor. By default, the technologies are evaluated serially.
+    scenarios : sequence of str or of tuple
+      The scenarios to evaluate, as scenario names or (technology, scenario) pairs, or None for every scenario. Other scenarios are neither sampled nor computed, and technologies without any of them are skipped.
     """
 
-    costs   = pd.DataFrame()
-    outputs = pd.DataFrame()
-    metrics = pd.DataFrame()
-    for technology in self.vectorize_technologies():
-      result = self.evaluate(technology, sample_count)
-      costs   = pd.concat([costs, result.cost])
-      outputs = pd.concat([outputs, result.output])
-      metrics = pd.concat([metrics, result.metric])
+    selected = self._select_scenarios(scenarios)
+
+    results = self._map_technologies(
+      self.evaluate,
+      list(selected),
+      sample_count,
+      sampling,
+      seed,
+      executor,
+      n_jobs,
+      selected,
+    )
+
+    # Collect the blocks for each technology and concatenate them once, so
+    # assembly is linear in the number of technologies.
+    costs   = []
+    outputs = []
+    metrics = []
+    for result in results:
+      costs.append(result.cost)
+      outputs.append(result.output)
+      metrics.append(result.metric)
+
+    units = self.results[self.results.index.get_level_values("Technology").isin(list(selected))]
 
     def organize(variable, values):
-      return self.results.xs(
+      return units.xs(
         variable,
         level="Variable",
         drop_level=False
@@ -347,8 +551,349 @@ class Designs:
         ["Technology", "Scenario", "Sample", "Variable", "Index"]
       )[["Value", "Units"]]
 
+    def combine(blocks):
+      return pd.concat(blocks) if len(blocks) > 0 else pd.DataFrame({"Value" : []})
+
     return pd.concat([
-      organize("Cost", costs),
-      organize("Output", outputs),
-      organize("Metric", metrics)
+      organize("Cost", combine(costs)),
+      organize("Output", combine(outputs)),
+      organize("Metric", combine(metrics))
       ]).sort_index()
+
+  def _evaluate_results(self, technology, sample_count=1, sampling="random", seed=None, scenarios=None, cache=True):
+    # Evaluate a technology into arrays indexed by (index, scenario, sample).
+    # Seeded results are memoized in the result cache, if there is one.
+    print(f"Evaluating {technology}")
+    key = None
+    if cache and self.result_cache is not None and seed is not None:
+      key = ResultCache.key(
+        self._fingerprint(technology),
+        sample_count,
+        sampling,
+        seed_label(seed),
+        None if scenarios is None else tuple(scenarios),
+      )
+      arrays = self.result_cache.load(key)
+      if arrays is not None:
+        return Results(**arrays)
+    scenario_count = self._select_plan(technology, scenarios).scenarios.shape[0]
+    _, _, result = self._evaluate_arrays(technology, scenario_count, sample_count, sampling, seed, scenarios)
+    if key is not None:
+      self.result_cache.save(key, result._asdict())
+    return result
+
+  def _fingerprint(self, technology):
+    # Digest the rows of the tables for a technology, the source of its model,
+    # and whether it is uncertain, which together determine its results.
+    if technology not in self._fingerprints:
+      digest = hl.sha256(repr(self.uncertain).encode())
+      for table in [self.indices, self.functions, self.designs, self.parameters, self.results]:
+        rows = table[table.index.get_level_values("Technology") == technology]
+        digest.update(pd.util.hash_pandas_object(rows.reset_index(), index=False).values.tobytes())
+      module = sys.modules[self.compiled_functions[technology].capital.__module__]
+      with open(module.__file__, "rb") as f:
+        digest.update(f.read())
+      self._fingerprints[technology] = digest.hexdigest()
+    return self._fingerprints[technology]
+
+  def _map_technologies(self, function, technologies, sample_count, sampling, seed, executor=None, n_jobs=None, scenarios=None):
+    # Evaluate each technology, serially or in an executor, returning an
+    # iterator over the results in the order of the technologies. Arguments
+    # are checked here, before any technology is evaluated.
+    if n_jobs is not None:
+      if not isinstance(n_jobs, (int, np.integer)) or isinstance(n_jobs, bool) or n_jobs == 0:
+        raise ValueError(f"Designs: n_jobs must be a positive number of processes, or negative to use every processor, not {n_jobs!r}.")
+      if n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+
+    pool = None
+    if executor is None and n_jobs is not None and n_jobs != 1:
+      pool = cf.ProcessPoolExecutor(n_jobs)
+      executor = pool
+
+    return self._iterate_technologies(function, technologies, sample_count, sampling, seed, executor, pool, scenarios)
+
+  def _iterate_technologies(self, function, technologies, sample_count, sampling, seed, executor, pool, scenarios):
+    if executor is None:
+      for technology in technologies:
+        yield function(technology, sample_count, sampling, seed, None if scenarios is None else scenarios[technology])
+      return
+
+    # Workers would otherwise share (or, when forked, duplicate) numpy's
+    # global random state, so derive their streams from fresh entropy. The
+    # caller did not seed the run, so its results are not cached.
+    cache = seed is not None
+    if seed is None:
+      seed = np.random.SeedSequence()
+    try:
+      futures = [
+        executor.submit(function, technology, sample_count, sampling, seed, None if scenarios is None else scenarios[technology], cache)
+        for technology in technologies
+      ]
+      for future in futures:
+        yield future.result()
+    finally:
+      if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+  def evaluate_ensemble(self, sample_count=1, sampling="random", seed=None, executor=None, n_jobs=None, scenarios=None):
+    """
+    Evaluate scenarios into dense arrays.
+
+    This evaluates the same samples as `evaluate_scenarios`, but skips
+    building the long-form frames; call `to_frame` on the result to get them.
+
+    Parameters
+    ----------
+    sample_count : int
+      The number of random samples.
+    sampling : str
+      How to sample the distributions: "random", "lhs", or "sobol".
+    seed : int or numpy.random.SeedSequence
+      Seed for reproducible sampling, or None to use numpy's global random state.
+    executor : concurrent.futures.Executor
+      Executor, such as a ProcessPoolExecutor, in which to evaluate each technology. The designs must be picklable for a process pool.
+    n_jobs : int
+      Number of worker processes to evaluate the technologies in, if no executor is given; -1 uses every processor. By default, the technologies are evaluated serially.
+    scenarios : sequence of str or of tuple
+      The scenarios to evaluate, as scenario names or (technology, scenario) pairs, or None for every scenario, as for `evaluate_scenarios`.
+
+    Returns
+    -------
+    Ensemble
+    """
+
+    selected     = self._select_scenarios(scenarios)
+    technologies = list(selected)
+    scenarios    = {technology : self._select_plan(technology, selected[technology]).scenarios for technology in technologies}
+    indices      = {technology : self.plans[technology].indices for technology in technologies}
+
+    def union(labels):
+      labels = [np.asarray(ix, dtype=object) for ix in labels]
+      if len(labels) == 0:
+        return pd.Index([], dtype=object)
+      return pd.Index(np.concatenate(labels)).unique().sort_values()
+
+    ensemble = Ensemble(
+      technologies,
+      union(scenarios.values()),
+      sample_count,
+      {
+        "Cost"   : ["Cost"],
+        "Output" : union(ix.output for ix in indices.values()),
+        "Metric" : union(ix.metric for ix in indices.values()),
+      },
+      self.results,
+    )
+
+    results = self._map_technologies(
+      self._evaluate_results,
+      technologies,
+      sample_count,
+      sampling,
+      seed,
+      executor,
+      n_jobs,
+      selected,
+    )
+    for technology, result in zip(technologies, results):
+      ensemble.assign(technology, scenarios[technology], indices[technology], result)
+
+    return ensemble
+
+  def evaluate_statistics(
+    self                              ,
+    sample_count   = 1                ,
+    block_size     = None             ,
+    memory_budget  = None             ,
+    quantiles      = (0.05, 0.5, 0.95),
+    reservoir_size = 1000             ,
+    sampling       = "random"         ,
+    seed           = None             ,
+  ):
+    """
+    Evaluate summary statistics of the scenarios, in blocks of samples.
+
+    Only one block of samples is held in memory at a time, so the peak
+    memory does not grow with the number of samples. The blocks are sampled
+    independently, so "lhs" and "sobol" sampling stratify within each block.
+
+    Parameters
+    ----------
+    sample_count : int
+      The number of random samples.
+    block_size : int
+      The number of samples in each block.
+    memory_budget : int
+      The approximate number of bytes of sampled inputs and results to hold at once, used to choose the block size when none is given. By default, blocks have 1000 samples.
+    quantiles : sequence of float
+      The probabilities of the quantiles to estimate.
+    reservoir_size : int
+      The number of samples retained for each result to estimate quantiles.
+    sampling : str
+      How to sample the distributions: "random", "lhs", or "sobol".
+    seed : int or numpy.random.SeedSequence
+      Seed for reproducible sampling, or None to use numpy's global random state.
+
+    Returns
+    -------
+    DataFrame
+      The count, mean, variance, minimum, maximum, and quantiles of each result, indexed by technology, scenario, variable, and index.
+    """
+
+    def footprint(technology, n):
+      design, parameter, result = self._evaluate_arrays(technology, n, 1, sampling, seed)
+      return sum(np.asarray(array).nbytes for array in [*design, parameter, *result])
+
+    frames = []
+    for technology in self.plans:
+      print(f"Evaluating {technology}")
+      n = self.plans[technology].scenarios.shape[0]
+
+      size = choose_block_size(sample_count, block_size, memory_budget, lambda: footprint(technology, n))
+
+      statistics = self._online_statistics(technology, reservoir_size, seed)
+      for result in self._evaluate_blocks(technology, sample_count, size, sampling, seed):
+        for variable, values in zip(Results._fields, result):
+          statistics[variable].update(values)
+
+      frames += self._summarize_statistics(technology, statistics, quantiles)
+
+    return self._statistics_frame(frames)
+
+  def evaluate_adaptive(
+    self                                  ,
+    tolerance          = 0.01             ,
+    statistic          = "mean"           ,
+    confidence         = 0.95             ,
+    absolute_tolerance = 0.0              ,
+    block_size         = 100              ,
+    max_sample_count   = 10000            ,
+    variables          = ("Metric",)      ,
+    quantiles          = (0.05, 0.5, 0.95),
+    reservoir_size     = 1000             ,
+    sampling           = "random"         ,
+    seed               = None             ,
+  ):
+    """
+    Evaluate summary statistics of the scenarios, sampling until they converge.
+
+    Each technology is sampled in blocks until, for every scenario and index of
+    the chosen variables, the confidence interval of the chosen statistic is
+    within the tolerance, or until the maximum sample count is reached. The
+    blocks are the same as those of `evaluate_statistics` with the same block
+    size and seed.
+
+    Parameters
+    ----------
+    tolerance : float
+      The largest acceptable half-width of the confidence interval, relative to the magnitude of the statistic.
+    statistic : str or float
+      The statistic that must converge: "mean", or the probability of a quantile.
+    confidence : float
+      The confidence level of the interval.
+    absolute_tolerance : float
+      The half-width of the confidence interval that is acceptable regardless of the magnitude of the statistic, for statistics near zero.
+    block_size : int
+      The number of samples in each block.
+    max_sample_count : int
+      The largest number of samples to draw for a technology.
+    variables : sequence of str
+      The variables, among "Cost", "Output", and "Metric", that must converge.
+    quantiles : sequence of float
+      The probabilities of the quantiles to estimate.
+    reservoir_size : int
+      The number of samples retained for each result to estimate quantiles.
+    sampling : str
+      How to sample the distributions: "random", "lhs", or "sobol".
+    seed : int or numpy.random.SeedSequence
+      Seed for reproducible sampling, or None to use numpy's global random state.
+
+    Returns
+    -------
+    DataFrame
+      The statistics of each result, as for `evaluate_statistics`, together with whether its statistic converged and the sample count at which it first did.
+    """
+
+    z = st.norm.ppf(0.5 + confidence / 2)
+
+    frames = []
+    for technology in self.plans:
+      print(f"Evaluating {technology}")
+      statistics = self._online_statistics(technology, reservoir_size, seed)
+      required = {}
+      converged = {}
+      for result in self._evaluate_blocks(technology, max_sample_count, block_size, sampling, seed):
+        finished = True
+        for variable, values in zip(Results._fields, result):
+          statistics[variable].update(values)
+          estimate, half_width = statistics[variable].interval(statistic, z)
+          converged[variable] = half_width <= np.maximum(tolerance * np.abs(estimate), absolute_tolerance)
+          if variable not in required:
+            required[variable] = np.full(converged[variable].shape, np.nan)
+          required[variable][converged[variable] & np.isnan(required[variable])] = statistics[variable].count
+          if variable.capitalize() in variables and not np.all(converged[variable]):
+            finished = False
+        if finished:
+          break
+
+      frames += self._summarize_statistics(technology, statistics, quantiles, {
+        variable : {
+          "Converged" : converged[variable].ravel(),
+          "Required"  : required[variable].ravel() ,
+        }
+        for variable in Results._fields
+      })
+
+    return self._statistics_frame(frames)
+
+  def _online_statistics(self, technology, reservoir_size, seed):
+    # Running statistics for each variable of a technology.
+    return {
+      variable : OnlineStatistics(reservoir_size, stream(seed, technology, "Reservoir", variable))
+      for variable in Results._fields
+    }
+
+  def _evaluate_blocks(self, technology, sample_count, block_size, sampling, seed):
+    # Evaluate a technology in blocks of samples, yielding the results of
+    # each block. A single block uses the seed itself, so that it matches
+    # `evaluate`; otherwise each block has its own stream.
+    n = self.plans[technology].scenarios.shape[0]
+    size = max(1, min(block_size, sample_count))
+    for block, start in enumerate(range(0, sample_count, size)):
+      _, _, result = self._evaluate_arrays(
+        technology,
+        n,
+        min(size, sample_count - start),
+        sampling,
+        seed if size >= sample_count else stream(seed, "Block", block),
+      )
+      yield result
+
+  def _summarize_statistics(self, technology, statistics, quantiles, columns=None):
+    # Frames of the statistics of each variable of a technology, indexed by
+    # technology, variable, index, and scenario.
+    indices   = self.plans[technology].indices
+    scenarios = self.plans[technology].scenarios
+    frames = []
+    for variable, ix in zip(Results._fields, [["Cost"], indices.output, indices.metric]):
+      frame = statistics[variable].summarize(quantiles)
+      if columns is not None:
+        for column, values in columns[variable].items():
+          frame[column] = values
+      frame.index = pd.MultiIndex.from_product(
+        [[technology], [variable.capitalize()], ix, scenarios],
+        names=["Technology", "Variable", "Index", "Scenario"],
+      )
+      frames.append(frame)
+    return frames
+
+  def _statistics_frame(self, frames):
+    # Combine the frames of statistics, with the units of the results.
+    return pd.concat(
+      frames
+    ).join(
+      self.results[["Units"]]
+    ).reorder_levels(
+      ["Technology", "Scenario", "Variable", "Index"]
+    ).sort_index()
@@ -2,12 +2,73 @@
 Utilities for probability distributions.
 """
 
+import ast
+import hashlib  as hl
+import numbers
+import operator
 import numpy       as np
+import pandas      as pd
 import scipy.stats as st
 
 from numpy.linalg import norm
+from scipy.stats  import qmc
 from numpy.random import choice
-from .Types       import SynthesizedDistribution
+
+
+class Constant:
+  """
+  A distribution that always takes the same value.
+
+  It supports the parts of the scipy.stats frozen-distribution interface
+  that Tyche uses, without the overhead of scipy's sampling machinery.
+
+  Attributes
+  ----------
+  value : float
+    The constant value.
+  """
+
+  def __init__(self, value):
+    """
+    Parameters
+    ----------
+    value : float
+      The constant value.
+    """
+    self.value = np.float64(value)
+
+  def rvs(self, size=None, random_state=None):
+    """
+    Sample the distribution.
+
+    Parameters
+    ----------
+    size : int or tuple of int
+      The shape of the sample, or None for a single value.
+    random_state : any
+      Ignored.
+    """
+    if size is None:
+      return self.value
+    return np.full(size, self.value)
+
+  def ppf(self, q):
+    """
+    The percent point function.
+
+    Parameters
+    ----------
+    q : array of float
+      The probabilities.
+    """
+    return np.full(np.shape(q), self.value)
+
+  def mean(self):
+    """The mean of the distribution."""
+    return self.value
+
+  def __repr__(self):
+    return f"constant({self.value!r})"
 
 
 def constant(value):
@@ -20,7 +81,86 @@ def constant(value):
     The constant value.
   """
 
-  return st.norm(value, 0)
+  return Constant(value)
+
+
+class Mixture:
+  """
+  A mixture of distributions.
+
+  Attributes
+  ----------
+  weights : array of float
+    The probabilities of the distributions, which sum to one.
+  distributions : list of distributions
+    The distributions that are mixed.
+  """
+
+  def __init__(self, weights, distributions):
+    """
+    Parameters
+    ----------
+    weights : array of float
+      The weights of the distributions to be mixed.
+    distributions : array of distributions
+      The distributions to be mixed.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    self.weights       = weights / np.linalg.norm(weights, ord=1)
+    self.distributions = list(distributions)
+
+  def rvs(self, size=None, random_state=None):
+    """
+    Sample the distribution.
+
+    The number of samples from each distribution is drawn at once, each
+    distribution is sampled once for all of its draws, and then the draws
+    are shuffled.
+
+    Parameters
+    ----------
+    size : int
+      The number of samples, or None for a single value.
+    random_state : numpy.random.Generator
+      The source of randomness, or None for numpy's global random state.
+    """
+    rng = np.random if random_state is None else random_state
+    counts = rng.multinomial(1 if size is None else size, self.weights)
+    samples = np.concatenate([
+      np.atleast_1d(distribution.rvs(count, random_state=random_state))
+      for distribution, count in zip(self.distributions, counts)
+    ]).astype(np.float64)
+    rng.shuffle(samples)
+    return samples[0] if size is None else samples
+
+  def ppf(self, q):
+    """
+    Map probabilities to values of the distribution.
+
+    The probability first selects a distribution, in proportion to the
+    weights, and then is rescaled to a probability within that distribution.
+    This maps uniform probabilities to samples of the mixture, as an inverse
+    distribution function does, though it is not monotonic.
+
+    Parameters
+    ----------
+    q : array of float
+      The probabilities.
+    """
+    q = np.asarray(q, dtype=np.float64)
+    upper = np.cumsum(self.weights)
+    lower = upper - self.weights
+    k = np.minimum(np.searchsorted(upper, q, side="right"), len(self.weights) - 1)
+    r = np.clip((q - lower[k]) / self.weights[k], 0, 1)
+    values = np.empty(q.shape, dtype=np.float64)
+    for i, distribution in enumerate(self.distributions):
+      selected = k == i
+      if selected.any():
+        values[selected] = distribution.ppf(r[selected])
+    return values
+
+  def __repr__(self):
+    return f"mixture({self.weights.tolist()!r}, {self.distributions!r})"
 
 
 def mixture(weights, distributions):
@@ -35,30 +175,421 @@ def mixture(weights, distributions):
     The distributions to be mixed.
   """
 
-  ks = np.arange(0, len(weights))
-  ps = weights / np.linalg.norm(weights, ord=1)
-  return SynthesizedDistribution(
-    rvs = lambda n: np.fromiter(
-      map(
-        lambda i: distributions[i].rvs(),
-        np.random.choice(ks, n, p=ps)
-      ),
-      dtype=float
+  return Mixture(weights, distributions)
+
+
+FUNCTIONS = {
+  "constant": constant,
+  "mixture" : mixture ,
+}
+"""
+The functions, other than scipy.stats families, allowed in distribution expressions.
+"""
+
+_BINARY_OPERATORS = {
+  ast.Add : operator.add    ,
+  ast.Sub : operator.sub    ,
+  ast.Mult: operator.mul    ,
+  ast.Div : operator.truediv,
+  ast.Pow : operator.pow    ,
+}
+
+_MAX_EXPONENT = 1000
+"""
+Largest magnitude of an exponent in a distribution expression.
+"""
+
+_UNARY_OPERATORS = {
+  ast.UAdd: operator.pos,
+  ast.USub: operator.neg,
+}
+
+
+def _compile(node, text):
+  # Evaluate a node of a distribution expression, allowing only numbers,
+  # arithmetic on numbers, lists, scipy.stats families (as `st.family`),
+  # and the functions in FUNCTIONS.
+  if isinstance(node, ast.Expression):
+    return _compile(node.body, text)
+  if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+    return node.value
+  if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+    operand = _compile(node.operand, text)
+    if isinstance(operand, numbers.Number):
+      return _UNARY_OPERATORS[type(node.op)](operand)
+  if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+    left  = _compile(node.left , text)
+    right = _compile(node.right, text)
+    if isinstance(left, numbers.Number) and isinstance(right, numbers.Number):
+      # Powers are bounded and taken in floating point, so that expressions
+      # such as `9**9**9**9` fail quickly instead of building huge integers.
+      if isinstance(node.op, ast.Pow):
+        if abs(right) > _MAX_EXPONENT:
+          raise ValueError(f"Distributions: Exponent too large in {text!r}.")
+        left = float(left)
+      try:
+        value = _BINARY_OPERATORS[type(node.op)](left, right)
+      except (ArithmeticError, ValueError) as e:
+        raise ValueError(f"Distributions: Invalid arithmetic in {text!r}.") from e
+      if isinstance(value, complex):
+        raise ValueError(f"Distributions: Invalid arithmetic in {text!r}.")
+      return value
+  if isinstance(node, (ast.List, ast.Tuple)):
+    return [_compile(element, text) for element in node.elts]
+  if isinstance(node, ast.Call) and all(keyword.arg is not None for keyword in node.keywords):
+    function = _compile_function(node.func, text)
+    return function(
+      *[_compile(arg, text) for arg in node.args],
+      **{keyword.arg: _compile(keyword.value, text) for keyword in node.keywords},
     )
-  )
+  raise ValueError(f"Distributions: Unsupported expression in {text!r}.")
+
+
+def _compile_function(node, text):
+  # Resolve the function called in a distribution expression.
+  if isinstance(node, ast.Name) and node.id in FUNCTIONS:
+    return FUNCTIONS[node.id]
+  if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "st":
+    family = getattr(st, node.attr, None)
+    if isinstance(family, (st.rv_continuous, st.rv_discrete)):
+      return family
+  raise ValueError(f"Distributions: Unsupported function in {text!r}.")
 
 
 def parse_distribution(text):
   """
   Make the Python object for the distribution, if any is specified.
 
+  Expressions are compiled without `eval`: they may only contain numbers,
+  arithmetic on numbers, lists, scipy.stats families written as `st.family`,
+  and the functions `constant` and `mixture`. The resulting objects can be
+  pickled.
+
   Parameters
   ----------
   text : str
-    The Python expression for the distribution, or plain text.
+    The Python expression for the distribution, or a number.
   """
 
   try:
     return constant(np.float64(text))
   except ValueError:
-    return eval(text)
+    try:
+      tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as e:
+      raise ValueError(f"Distributions: Invalid expression {text!r}.") from e
+    distribution = _compile(tree, text)
+    # Arithmetic on numbers, such as `2*3`, compiles to a plain number.
+    if isinstance(distribution, numbers.Number):
+      return constant(distribution)
+    return distribution
+
+
+def parse_distributions(texts, cache=None):
+  """
+  Make the Python objects for a series of distributions.
+
+  Each distinct expression is parsed only once, and all of the cells holding
+  it share the resulting object.
+
+  Parameters
+  ----------
+  texts : Series of str
+    The Python expressions for the distributions, or plain text.
+  cache : dict
+    The objects already made for expressions, which is updated in place.
+  """
+
+  if cache is None:
+    cache = {}
+  codes, uniques = pd.factorize(texts)
+  distributions = np.empty(len(uniques) + 1, dtype=object)
+  for i, text in enumerate(uniques):
+    if text not in cache:
+      cache[text] = parse_distribution(text)
+    distributions[i] = cache[text]
+  # Missing values have the code -1, so they pick up the last entry.
+  if (codes < 0).any():
+    distributions[-1] = parse_distribution(np.nan)
+  return pd.Series(distributions[codes], index=texts.index, name=texts.name)
+
+
+def batch_key(distribution):
+  """
+  The key under which a distribution is sampled together with others.
+
+  Frozen scipy.stats distributions of the same family whose parameters are
+  given in the same way share a key, as do all constant distributions; other
+  distributions have the key None.
+
+  Parameters
+  ----------
+  distribution : distribution
+    The distribution.
+  """
+
+  if isinstance(distribution, Constant):
+    return Constant
+  family = getattr(distribution, "dist", None)
+  if not isinstance(family, (st.rv_continuous, st.rv_discrete)):
+    return None
+  # Only the standard families are interchangeable with each other: other
+  # instances may carry their own construction parameters.
+  if type(family) is not type(getattr(st, family.name, None)):
+    return None
+  return (
+    type(family),
+    len(distribution.args),
+    tuple(sorted(distribution.kwds.keys())),
+  )
+
+
+def label_key(*labels):
+  """
+  A stable integer key for a tuple of labels.
+
+  Unlike `hash`, the key is the same in every Python process.
+
+  Parameters
+  ----------
+  labels : any
+    The labels, such as a technology and a scenario.
+  """
+
+  digest = hl.sha256("\x1f".join(str(label) for label in labels).encode()).digest()
+  return int.from_bytes(digest[:8], "little")
+
+
+def seed_label(seed):
+  """
+  A hashable label that identifies a seed, for keys of caches.
+
+  Parameters
+  ----------
+  seed : int or numpy.random.SeedSequence
+    The seed, or None.
+  """
+
+  if isinstance(seed, np.random.SeedSequence):
+    return (seed.entropy, seed.spawn_key)
+  return seed
+
+
+def stream(seed, *labels):
+  """
+  The independent random stream for a seed and a tuple of labels.
+
+  Streams are derived with numpy's SeedSequence, so the stream for the same
+  seed and labels is identical in every process, and streams for different
+  labels are independent.
+
+  Parameters
+  ----------
+  seed : int or numpy.random.SeedSequence
+    The seed, or a stream to derive a child stream from. If None, None is returned.
+  labels : any
+    The labels, such as a technology and a scenario.
+
+  Returns
+  -------
+  numpy.random.SeedSequence
+  """
+
+  if seed is None:
+    return None
+  if not isinstance(seed, np.random.SeedSequence):
+    seed = np.random.SeedSequence(seed)
+  return np.random.SeedSequence(
+    seed.entropy,
+    spawn_key = tuple(seed.spawn_key) + tuple(label_key(label) for label in labels),
+  )
+
+
+SAMPLINGS = ("random", "lhs", "sobol")
+"""
+The sampling modes: independent pseudo-random draws, Latin hypercube samples, and scrambled Sobol points.
+"""
+
+
+def uniforms(cell_count, sample_count, sampling, seed=None):
+  """
+  Stratified points in the unit hypercube, with one dimension per cell.
+
+  Parameters
+  ----------
+  cell_count : int
+    The number of dimensions.
+  sample_count : int
+    The number of points. Sobol points are best balanced when this is a power of two.
+  sampling : str
+    Either "lhs" or "sobol".
+  seed : numpy.random.SeedSequence
+    The random stream for scrambling the points, or None for fresh entropy.
+
+  Returns
+  -------
+  Array of shape `(cell_count, sample_count)`.
+  """
+
+  if cell_count == 0:
+    return np.empty((0, sample_count))
+  if sampling == "lhs":
+    engine = qmc.LatinHypercube(d=cell_count, seed=np.random.default_rng(seed))
+  elif sampling == "sobol":
+    engine = qmc.Sobol(d=cell_count, scramble=True, seed=np.random.default_rng(seed))
+  else:
+    raise ValueError(f"Distributions: Unknown sampling {sampling!r}; use one of {SAMPLINGS}.")
+  return engine.random(sample_count).T
+
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix(z):
+  # The SplitMix64 finalizer, applied elementwise to an array of uint64.
+  z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+  z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+  return z ^ (z >> np.uint64(31))
+
+
+def keyed_uniforms(seed, keys, sample_count):
+  """
+  Uniform points from independent streams for each key, generated together.
+
+  Each key's stream is a SplitMix64 sequence whose state is derived from
+  the seed and the key, so the points for a key depend on nothing else, yet
+  the streams for all of the keys are computed with array arithmetic rather
+  than a generator for each key.
+
+  Parameters
+  ----------
+  seed : int or numpy.random.SeedSequence
+    The seed.
+  keys : array of int
+    The keys, such as from `label_key`.
+  sample_count : int
+    The number of points for each key.
+
+  Returns
+  -------
+  Array of shape `(len(keys), sample_count)` of floats in the open interval (0, 1).
+  """
+
+  if not isinstance(seed, np.random.SeedSequence):
+    seed = np.random.SeedSequence(seed)
+  base = seed.generate_state(2, dtype=np.uint64)
+  keys = np.asarray(keys).astype(np.uint64).reshape(-1, 1)
+  counters = np.arange(1, sample_count + 1, dtype=np.uint64)
+  state = _mix(_mix(keys ^ base[0]) ^ base[1])
+  z = _mix(state + counters * _GOLDEN)
+  return ((z >> np.uint64(11)).astype(np.float64) + 0.5) * 2.0**-53
+
+
+def _family_arguments(distributions, key):
+  # Stack the parameters of frozen scipy distributions with the same batch
+  # key into column arrays.
+  _, arg_count, kwd_names = key
+  args = [
+    np.array([d.args[j] for d in distributions], dtype=np.float64)[:, np.newaxis]
+    for j in range(arg_count)
+  ]
+  kwds = {
+    name: np.array([d.kwds[name] for d in distributions], dtype=np.float64)[:, np.newaxis]
+    for name in kwd_names
+  }
+  return args, kwds
+
+
+def sampler(x, sample_count, sampling="random", seed=None, keys=None, points=None):
+  """
+  Sample from an array.
+
+  The cells of the array are grouped by distribution family, and all of the
+  cells in a group are sampled with one vectorized call. Constant cells are
+  filled without sampling; if every cell is constant, the result is a
+  read-only broadcast view rather than a new array of samples.
+
+  With "lhs" or "sobol" sampling, each cell is a dimension of a Latin
+  hypercube or scrambled Sobol design, whose points are mapped through the
+  cells' inverse distribution functions (`ppf`).
+
+  With a seed, the samples are reproducible. For "random" sampling, each cell
+  draws uniform points from its own stream, derived from the seed and the
+  cell's key with `keyed_uniforms`, and maps them through its `ppf`; so a
+  cell's samples do not depend on which other cells are sampled with it. For "lhs" and "sobol"
+  sampling, the design for the whole array is derived from the seed, unless
+  its points are given as dimensions of a larger design.
+
+  Parameters
+  ----------
+  x : array
+    The array.
+  sample_count : int
+    The sample size.
+  sampling : str
+    The sampling mode, one of SAMPLINGS.
+  seed : int or numpy.random.SeedSequence
+    The random stream for the array, or None to use numpy's global random state.
+  keys : array of int
+    Stable keys for the cells, with the shape of `x`, such as from `label_key`. By default, the cells' positions are used.
+  points : array
+    Points in the unit hypercube for "lhs" or "sobol" sampling, with the shape of `x` plus a trailing axis of length `sample_count`, such as the dimensions for the array of a design shared with other arrays. By default, a design for the array alone is drawn.
+
+  Returns
+  -------
+  Array of floats with the shape of `x` plus a trailing axis of length `sample_count`.
+  """
+
+  if sampling not in SAMPLINGS:
+    raise ValueError(f"Distributions: Unknown sampling {sampling!r}; use one of {SAMPLINGS}.")
+
+  x = np.asarray(x, dtype=object)
+  cells = x.ravel()
+
+  groups = {}
+  for i, distribution in enumerate(cells):
+    groups.setdefault(batch_key(distribution), []).append(i)
+
+  if cells.size > 0 and list(groups.keys()) == [Constant]:
+    values = np.array([d.value for d in cells], dtype=np.float64)
+    return np.broadcast_to(
+      values.reshape(x.shape + (1,)),
+      x.shape + (sample_count,),
+    )
+
+  if seed is not None and not isinstance(seed, np.random.SeedSequence):
+    seed = np.random.SeedSequence(seed)
+
+  if sampling != "random":
+    if points is None:
+      u = uniforms(cells.size, sample_count, sampling, seed)
+    else:
+      u = np.reshape(points, (cells.size, sample_count))
+  elif seed is not None:
+    keys = np.arange(cells.size) if keys is None else np.asarray(keys).ravel()
+    varying = [i for key, group in groups.items() if key is not Constant for i in group]
+    u = np.empty((cells.size, sample_count), dtype=np.float64)
+    u[varying] = keyed_uniforms(seed, keys[varying], sample_count)
+  else:
+    u = None
+
+  samples = np.empty((cells.size, sample_count), dtype=np.float64)
+  for key, group in groups.items():
+    if key is Constant:
+      samples[group] = np.array([cells[i].value for i in group])[:, np.newaxis]
+    elif key is None:
+      for i in group:
+        samples[i] = cells[i].rvs(sample_count) if u is None else cells[i].ppf(u[i])
+    else:
+      distributions = cells[group]
+      args, kwds = _family_arguments(distributions, key)
+      if u is None:
+        samples[group] = distributions[0].dist.rvs(
+          *args,
+          size=(len(group), sample_count),
+          **kwds,
+        )
+      else:
+        samples[group] = distributions[0].dist.ppf(u[group], *args, **kwds)
+
+  return samples.reshape(x.shape + (sample_count,))
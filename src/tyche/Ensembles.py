@@ -0,0 +1,146 @@
+"""
+Dense arrays of results for ensembles of technologies.
+"""
+
+import numpy  as np
+import pandas as pd
+
+
+VARIABLES = ("Cost", "Output", "Metric")
+"""
+The result variables, in the order of the fields of Results.
+"""
+
+
+class Ensemble:
+  """
+  Results of evaluating technologies, held as dense arrays with label axes.
+
+  Each variable is a float array indexed by (technology, scenario, sample,
+  index). Technologies do not share every scenario or index, so the axes are
+  the union of the labels over the technologies: cells that a technology does
+  not have are NaN, and `valid` marks the scenarios each technology has.
+
+  Attributes
+  ----------
+  technologies : array
+    The labels of the technology axis.
+  scenarios : array
+    The labels of the scenario axis.
+  sample_count : int
+    The length of the sample axis.
+  indices : dict
+    The labels of the index axis for each variable.
+  values : dict
+    The array of results for each variable.
+  valid : array
+    Whether each technology has each scenario.
+  units : DataFrame
+    The units of the results, indexed by technology, variable, and index.
+  """
+
+  def __init__(self, technologies, scenarios, sample_count, indices, units):
+    """
+    Parameters
+    ----------
+    technologies : array
+      The labels of the technology axis.
+    scenarios : array
+      The labels of the scenario axis.
+    sample_count : int
+      The length of the sample axis.
+    indices : dict
+      The labels of the index axis for each variable.
+    units : DataFrame
+      The units of the results, indexed by technology, variable, and index.
+    """
+    self.technologies = np.asarray(technologies, dtype=object)
+    self.scenarios    = np.asarray(scenarios   , dtype=object)
+    self.sample_count = sample_count
+    self.indices      = {
+      variable : np.asarray(indices[variable], dtype=object)
+      for variable in VARIABLES
+    }
+    self.values       = {
+      variable : np.full(
+        (len(self.technologies), len(self.scenarios), sample_count, len(self.indices[variable])),
+        np.nan,
+      )
+      for variable in VARIABLES
+    }
+    self.valid        = np.zeros((len(self.technologies), len(self.scenarios)), dtype=bool)
+    self.units        = units
+
+  def __getitem__(self, variable):
+    return self.values[variable]
+
+  def _positions(self, axis, labels):
+    lookup = pd.Index(axis)
+    return lookup.get_indexer(labels)
+
+  def assign(self, technology, scenarios, indices, result):
+    """
+    Store the results for a technology.
+
+    Parameters
+    ----------
+    technology : str
+      The technology.
+    scenarios : array
+      The scenarios of the technology.
+    indices : Indices
+      The indices of the technology.
+    result : Results
+      The arrays of results, indexed by (index, scenario, sample).
+    """
+    t = self._positions(self.technologies, [technology])[0]
+    s = self._positions(self.scenarios, scenarios)
+    samples = np.arange(self.sample_count)
+    self.valid[t, s] = True
+    for variable, ix, values in zip(VARIABLES, [["Cost"], indices.output, indices.metric], result):
+      # Models may return extra singleton axes, so flatten to (index, scenario, sample).
+      values = np.reshape(values, (len(ix), len(s), self.sample_count))
+      block = self.values[variable][t]
+      block[np.ix_(s, samples, self._positions(self.indices[variable], ix))] = np.transpose(values, (1, 2, 0))
+
+  def to_frame(self):
+    """
+    Convert the results to the long form returned by `Designs.evaluate_scenarios`.
+
+    Returns
+    -------
+    DataFrame
+      The values and units, indexed by technology, scenario, sample, variable, and index.
+    """
+    t, s = np.nonzero(self.valid)
+    n = self.sample_count
+
+    def organize(variable):
+      ix = self.indices[variable]
+      values = self.values[variable][t, s]
+      k = len(t) * n * len(ix)
+      index = pd.MultiIndex(
+        levels = [self.technologies, self.scenarios, np.arange(1, n + 1), ix],
+        codes  = [
+          np.repeat(t, n * len(ix)),
+          np.repeat(s, n * len(ix)),
+          np.tile(np.repeat(np.arange(n), len(ix)), len(t)),
+          np.tile(np.arange(len(ix)), len(t) * n),
+        ],
+        names  = ["Technology", "Scenario", "Sample", "Index"],
+      )
+      frame = pd.DataFrame({"Value" : values.reshape(k)}, index=index)
+      return self.units.xs(
+        variable,
+        level="Variable",
+        drop_level=False
+      ).join(
+        frame
+      ).reorder_levels(
+        ["Technology", "Scenario", "Sample", "Variable", "Index"]
+      )[["Value", "Units"]]
+
+    return pd.concat([
+      organize(variable)
+      for variable in VARIABLES
+    ]).sort_index()
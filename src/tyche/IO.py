@@ -3,17 +3,428 @@ I/O utilities for Tyche.
 """
 
 import os     as os
+import hashlib   as hl
 import importlib as il
+import json      as json
+import numpy     as np
+import pandas    as pd
 
 from inspect import getmembers, isfunction
-from numpy import arange
 
 from .DataManager import DesignsDataset, FunctionsDataset, IndicesDataset, InvestmentsDataset, ParametersDataset, ResultsDataset, TranchesDataset
 
 
+CACHE_DIRECTORY = "__tychecache__"
+"""
+Name of the directory, next to a workbook, that holds its cache.
+"""
+
+CACHE_VERSION = 2
+"""
+Version of the cache format; caches of other versions are ignored.
+"""
+
+
+def file_digest(fpath):
+  """
+  Compute the SHA-256 digest of a file's contents.
+
+  Parameters
+  ----------
+  fpath : str
+    Location of the file.
+  """
+  digest = hl.sha256()
+  with open(fpath, "rb") as f:
+    for block in iter(lambda: f.read(1 << 20), b""):
+      digest.update(block)
+  return digest.hexdigest()
+
+
+class Workbook:
+  """
+  A session over a workbook of Tyche datasets.
+
+  Each sheet is parsed at most once, and the resulting datasets are shared by
+  `check_tables`, `Designs`, and `Investments`.
+
+  The workbook is either an XLSX file or a directory holding one CSV, TSV, or
+  Parquet file per dataset, named after its sheet, such as `designs.tsv`.
+
+  Once an XLSX workbook passes validation, its type-enforced datasets are written to a
+  binary cache in a `__tychecache__` directory next to it: an NPZ file of column
+  arrays and a JSON manifest holding the workbook's size, modification time, and
+  SHA-256 digest. Later sessions over the same, unchanged workbook load the
+  datasets from the cache and skip both `pandas.read_excel` and `check_tables`.
+
+  Attributes
+  ----------
+  fpath : str
+    Location of the workbook.
+  cache : bool
+    Whether to read and write the binary cache.
+  valid : bool
+    Result of `check_tables` on the workbook, or None if not yet checked.
+  """
+
+  DATASETS = {
+    "indices"    : IndicesDataset    ,
+    "functions"  : FunctionsDataset  ,
+    "designs"    : DesignsDataset    ,
+    "parameters" : ParametersDataset ,
+    "results"    : ResultsDataset    ,
+    "tranches"   : TranchesDataset   ,
+    "investments": InvestmentsDataset,
+  }
+
+  def __init__(self, fpath, cache=True):
+    """
+    Parameters
+    ----------
+    fpath : str
+      Location of the workbook (XLSX) or of the directory of dataset files.
+    cache : bool
+      Whether to read and write the binary cache of an XLSX workbook.
+    """
+    self.fpath     = fpath
+    self.cache     = cache and os.path.isfile(fpath)
+    self.valid     = None
+    self._book     = None
+    self._datasets = {}
+    self._cached   = not self.cache
+
+  def __getitem__(self, sheet):
+    """
+    Return the dataset for a sheet, parsing it on first use.
+
+    Parameters
+    ----------
+    sheet : str
+      Name of the sheet, which must be a key of `DATASETS`.
+    """
+    if not self._cached:
+      self.load_cache()
+    if sheet not in self._datasets:
+      if os.path.isdir(self.fpath):
+        self._datasets[sheet] = self.DATASETS[sheet](self.fpath)
+      else:
+        if self._book is None:
+          self._book = pd.ExcelFile(self.fpath)
+        self._datasets[sheet] = self.DATASETS[sheet](self._book)
+      # Release the file once every dataset has been parsed.
+      if len(self._datasets) == len(self.DATASETS):
+        self.close()
+    return self._datasets[sheet]
+
+  def validate(self):
+    """
+    Perform validity checks on the datasets, running `check_tables` only once.
+
+    Returns
+    -------
+    Boolean: True if data is valid, False otherwise
+    """
+    if self.valid is None and not self._cached:
+      self.load_cache()
+    if self.valid is None:
+      self.valid = check_tables(
+        os.path.dirname(self.fpath),
+        os.path.basename(self.fpath),
+        self,
+      )
+      if self.valid and self.cache:
+        self.save_cache()
+    return self.valid
+
+  def _cache_paths(self):
+    base = os.path.join(
+      os.path.dirname(self.fpath),
+      CACHE_DIRECTORY,
+      os.path.basename(self.fpath),
+    )
+    return base + ".json", base + ".npz"
+
+  def load_cache(self):
+    """
+    Load the datasets from the binary cache, if it matches the workbook.
+
+    The cache matches if the workbook's size and modification time are those
+    recorded in the manifest or, failing that, if its SHA-256 digest is; then
+    the new modification time is recorded, so the workbook is hashed only once
+    after it is touched.
+
+    Returns
+    -------
+    Boolean: True if the datasets were loaded from the cache, False otherwise
+    """
+    self._cached = True
+    manifest_path, arrays_path = self._cache_paths()
+    try:
+      with open(manifest_path) as f:
+        manifest = json.load(f)
+      stat = os.stat(self.fpath)
+      if manifest["version"] != CACHE_VERSION:
+        return False
+      if manifest["size"] != stat.st_size:
+        return False
+      touched = manifest["mtime"] != stat.st_mtime_ns
+      if touched and manifest["sha256"] != file_digest(self.fpath):
+        return False
+      datasets = {}
+      with np.load(arrays_path, allow_pickle=False) as arrays:
+        for sheet, dataset in self.DATASETS.items():
+          frame = pd.DataFrame({
+            column: self._decode(arrays, sheet + "." + column)
+            for column in manifest["tables"][sheet]
+          })
+          datasets[sheet] = dataset(frame)
+    except (OSError, ValueError, KeyError):
+      return False
+    self._datasets = datasets
+    self.valid     = True
+    self.close()
+    if touched:
+      manifest["mtime"] = stat.st_mtime_ns
+      self._write_manifest(manifest_path, manifest)
+    return True
+
+  def save_cache(self):
+    """
+    Write the datasets to the binary cache.
+
+    Returns
+    -------
+    Boolean: True if the cache was written, False otherwise
+    """
+    manifest_path, arrays_path = self._cache_paths()
+    arrays = {}
+    tables = {}
+    for sheet in self.DATASETS.keys():
+      frame = self[sheet].reset_index()
+      tables[sheet] = list(frame.columns)
+      for column in frame.columns:
+        arrays.update(self._encode(frame[column], sheet + "." + column))
+    stat = os.stat(self.fpath)
+    manifest = {
+      "version": CACHE_VERSION        ,
+      "size"   : stat.st_size         ,
+      "mtime"  : stat.st_mtime_ns     ,
+      "sha256" : file_digest(self.fpath),
+      "tables" : tables               ,
+    }
+    try:
+      os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+      # Write both files before publishing the manifest, so readers never see
+      # a manifest without its arrays.
+      with open(arrays_path + ".tmp", "wb") as f:
+        np.savez(f, **arrays)
+      os.replace(arrays_path + ".tmp", arrays_path)
+    except OSError as e:
+      print(f"Workbook: Could not write cache for {self.fpath}: {e}")
+      return False
+    return self._write_manifest(manifest_path, manifest)
+
+  def _write_manifest(self, manifest_path, manifest):
+    try:
+      with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+      os.replace(manifest_path + ".tmp", manifest_path)
+    except OSError as e:
+      print(f"Workbook: Could not write cache for {self.fpath}: {e}")
+      return False
+    return True
+
+  @staticmethod
+  def _encode(values, key):
+    # Numeric columns are stored as native arrays; only columns of objects,
+    # such as strings, are stored as text with a mask of missing values.
+    if pd.api.types.is_integer_dtype(values.dtype):
+      return {key: values.to_numpy(dtype=np.int64)}
+    if pd.api.types.is_float_dtype(values.dtype):
+      return {key: values.to_numpy(dtype=np.float64, na_value=np.nan)}
+    if pd.api.types.is_bool_dtype(values.dtype) and not values.isna().any():
+      return {key: values.to_numpy(dtype=bool)}
+    missing = values.isna().to_numpy()
+    return {
+      key        : values.where(~missing, "").astype(str).to_numpy(dtype=str),
+      key + ".na": missing,
+    }
+
+  @staticmethod
+  def _decode(arrays, key):
+    if key + ".na" not in arrays.files:
+      return arrays[key]
+    values = arrays[key].astype(object)
+    values[arrays[key + ".na"]] = np.nan
+    return values
+
+  def close(self):
+    """Close the underlying workbook file, if it is open."""
+    if self._book is not None:
+      self._book.close()
+      self._book = None
+
+  def __getstate__(self):
+    """Pickle the parsed datasets, but not the open workbook file."""
+    state = self.__dict__.copy()
+    state["_book"] = None
+    return state
+
+  def __enter__(self):
+    """Return self."""
+    return self
+
+  def __exit__(self, exc_type, exc_val, exc_tb):
+    """Close the workbook."""
+    self.close()
+    return False
+
+
+class ResultCache:
+  """
+  An on-disk cache of evaluation results, with least-recently-used eviction.
+
+  Each entry is an NPZ file of arrays named by the SHA-256 digest of its key.
+  Keys should cover every input of the computation, such as the content of the
+  tables and the source of the models, so that changed inputs never hit stale
+  entries; those entries age out instead. Reading an entry refreshes its
+  modification time, and writing one evicts the least recently used entries
+  until the cache fits in `max_bytes`.
+
+  Attributes
+  ----------
+  directory : str
+    Location of the cache.
+  max_bytes : int
+    The maximum total size of the entries.
+  """
+
+  def __init__(self, directory=CACHE_DIRECTORY, max_bytes=1 << 30):
+    """
+    Parameters
+    ----------
+    directory : str
+      Location of the cache.
+    max_bytes : int
+      The maximum total size of the entries.
+    """
+    self.directory = directory
+    self.max_bytes = max_bytes
+
+  @staticmethod
+  def key(*parts):
+    """
+    Compute the key for a tuple of parts.
+
+    Parameters
+    ----------
+    parts : str, bytes, or any
+      The parts of the key; parts other than strings and bytes are represented by `repr`.
+    """
+    digest = hl.sha256(str(CACHE_VERSION).encode())
+    for part in parts:
+      if isinstance(part, str):
+        part = part.encode()
+      elif not isinstance(part, bytes):
+        part = repr(part).encode()
+      digest.update(hl.sha256(part).digest())
+    return digest.hexdigest()
+
+  def _path(self, key):
+    return os.path.join(self.directory, key + ".npz")
+
+  def load(self, key):
+    """
+    Read an entry.
+
+    Parameters
+    ----------
+    key : str
+      The key of the entry.
+
+    Returns
+    -------
+    dict of arrays, or None if there is no such entry
+    """
+    path = self._path(key)
+    try:
+      with np.load(path, allow_pickle=False) as f:
+        arrays = {name : f[name] for name in f.files}
+      os.utime(path)
+    except (OSError, ValueError):
+      return None
+    return arrays
+
+  def save(self, key, arrays):
+    """
+    Write an entry.
+
+    Parameters
+    ----------
+    key : str
+      The key of the entry.
+    arrays : dict of arrays
+      The contents of the entry.
+
+    Returns
+    -------
+    Boolean: True if the entry was written, False otherwise
+    """
+    path = self._path(key)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+      os.makedirs(self.directory, exist_ok=True)
+      with open(temporary, "wb") as f:
+        np.savez(f, **arrays)
+      os.replace(temporary, path)
+    except OSError as e:
+      print(f"ResultCache: Could not write {path}: {e}")
+      return False
+    self.evict()
+    return True
+
+  def evict(self):
+    """
+    Remove the least recently used entries until the cache fits in its size bound.
+    """
+    try:
+      entries = [
+        entry
+        for entry in os.scandir(self.directory)
+        if entry.name.endswith(".npz")
+      ]
+    except OSError:
+      return
+    stats = []
+    for entry in entries:
+      try:
+        stats.append((entry.stat().st_mtime_ns, entry.stat().st_size, entry.path))
+      except OSError:
+        pass
+    total = sum(size for _, size, _ in stats)
+    for _, size, path in sorted(stats):
+      if total <= self.max_bytes:
+        break
+      try:
+        os.remove(path)
+      except OSError:
+        pass
+      total -= size
+
+  def clear(self):
+    """
+    Remove every entry.
+    """
+    max_bytes = self.max_bytes
+    self.max_bytes = -1
+    self.evict()
+    self.max_bytes = max_bytes
+
+
 def check_tables(
   path,
-  name
+  name,
+  workbook = None,
   ):
     """
     Perform validity checks on input datasets.
@@ -28,7 +439,9 @@ def check_tables(
     path:str
       Path to directory of datasets
     name:str
-      Name of datasets file (XLSX)
+      Name of datasets file (XLSX) or directory of dataset files (CSV, TSV, or Parquet), or None if path is that directory
+    workbook:Workbook
+      Open session over the datasets file, to avoid parsing it again
     
     Returns
     -------
@@ -38,23 +451,66 @@ def check_tables(
 
     # Get the datasets as distinct DataFrames.
     # The DataManager performs column name checks and enforces data types.
-    indices     = IndicesDataset(    os.path.join(path, name))
-    functions   = FunctionsDataset(  os.path.join(path, name))
-    designs     = DesignsDataset(    os.path.join(path, name))
-    parameters  = ParametersDataset( os.path.join(path, name))
-    results     = ResultsDataset(    os.path.join(path, name))
-    tranches    = TranchesDataset(   os.path.join(path, name))
-    investments = InvestmentsDataset(os.path.join(path, name))
+    if workbook is None:
+      workbook = Workbook(path if name is None else os.path.join(path, name), cache=False)
+    indices     = workbook["indices"    ]
+    functions   = workbook["functions"  ]
+    designs     = workbook["designs"    ]
+    parameters  = workbook["parameters" ]
+    results     = workbook["results"    ]
+    tranches    = workbook["tranches"   ]
+    investments = workbook["investments"]
+
+    # Index levels of each dataset as columns, for set and groupby operations.
+    _des_idx = designs.index.to_frame(index=False)
+    _ind_idx = indices.index.to_frame(index=False)
+    _par_idx = parameters.index.to_frame(index=False)
+    _res_idx = results.index.to_frame(index=False)
+    _inv_idx = investments.index.to_frame(index=False)
+    _tra_idx = tranches.index.to_frame(index=False)
+
+    _mandatory_vars = [
+      'Input', 'Input efficiency', 'Input price',
+      'Lifetime', 'Output efficiency', 'Output price', 'Scale'
+    ]
+
+    def _combinations(frame, first, second):
+      # The distinct first-second combinations, as hyphenated strings.
+      _pairs = frame[[first, second]].drop_duplicates()
+      return set(_pairs[first] + '-' + _pairs[second])
+
+    def _values(frame, column, level, labels):
+      # The distinct values of a column in the rows whose level is in labels.
+      return set(frame[column][frame[level].isin(labels)].unique())
+
+    def _sequential(offsets, levels):
+      # Whether the offsets within each group are exactly 0, 1, ..., n-1.
+      _stats = offsets.groupby(level=levels).agg(['size', 'nunique', 'min', 'max'])
+      return (
+        (_stats['nunique'] == _stats['size']) &
+        (_stats['min'    ] == 0             ) &
+        (_stats['max'    ] == _stats['size'] - 1)
+      )
+
+    def _missing(combinations, expected, present):
+      # The rows of the cross product of combinations and expected that are
+      # absent from present.
+      _all = combinations.merge(expected, how='cross').merge(
+        present.drop_duplicates(),
+        how='left',
+        indicator=True,
+      )
+      return _all[_all['_merge'] == 'left_only'].drop(columns='_merge')
 
     # Cross-check: Identical sets of Technology across designs, indices,
     # parameters, and results datasets
-    _odd_tech_set = set(designs.index.get_level_values('Technology')
+    _odd_tech_set = set(designs.index.unique('Technology')
       ).symmetric_difference(
-        set(indices.index.get_level_values('Technology'))
+        set(indices.index.unique('Technology'))
       ).symmetric_difference(
-        set(parameters.index.get_level_values('Technology'))
+        set(parameters.index.unique('Technology'))
       ).symmetric_difference(
-        set(results.index.get_level_values('Technology'))
+        set(results.index.unique('Technology'))
       )
     # If there are any technologies that DON'T appear in all four
     # datasets, add an error message to the check_list.
@@ -68,12 +524,9 @@ def check_tables(
     # Capital-Index set in indices dataset
     # The set of levels in the Index index level that have the Variable 
     # index level Lifetime
-    _des_idx = designs.index.to_frame()
-    _ind_idx = indices.index.to_frame()
-    _odd_cap_set = set(
-      _des_idx.Index[_des_idx.Variable == 'Lifetime']
+    _odd_cap_set = _values(_des_idx, 'Index', 'Variable', ['Lifetime']
       ).symmetric_difference(
-        set(_ind_idx.Index[_ind_idx.Type == 'Capital'])
+        _values(_ind_idx, 'Index', 'Type', ['Capital'])
       )
     if len(_odd_cap_set) != 0:
       check_list.append(
@@ -83,13 +536,10 @@ def check_tables(
     
     # Cross-check: Category-Tranche combinations in investments must be a subset of
     # the Category-Tranche combinations in tranches
-    _inv_idx = investments.index.to_frame()
-    _tra_idx = tranches.index.to_frame()
-    _odd_cattra_set = set(
-      [i + '-' + j for i, j in _inv_idx[['Category','Tranche']].values]
-    ).difference(
-      set([i + '-' + j for i, j in _tra_idx[['Category','Tranche']].values])
-    )
+    _odd_cattra_set = _combinations(_inv_idx, 'Category', 'Tranche'
+      ).difference(
+        _combinations(_tra_idx, 'Category', 'Tranche')
+      )
     if len(_odd_cattra_set) != 0:
       check_list.append(
         ('Data Validation: Category-Tranche combinations are inconsistent. Check '
@@ -98,12 +548,10 @@ def check_tables(
 
     # Cross-check: Technology-Scenario values in designs must be exactly the
     # set of Technology-Scenario values in parameters
-    _par_idx = parameters.index.to_frame()
-    _odd_tecsce_set = set(
-      [i + '-' + j for i, j in _des_idx[['Technology','Scenario']].values]
-    ).symmetric_difference(
-      set([i + '-' + j for i, j in _par_idx[['Technology','Scenario']].values])
-    )
+    _odd_tecsce_set = _combinations(_des_idx, 'Technology', 'Scenario'
+      ).symmetric_difference(
+        _combinations(_par_idx, 'Technology', 'Scenario')
+      )
 
     if len(_odd_tecsce_set) != 0:
       check_list.append(
@@ -115,12 +563,9 @@ def check_tables(
     # Input price, Lifetime, Output efficiency, Output price, Scale
     # Check if something's in designs Variable index levels that shouldn't be
     _des_var_set = set(
-      i for i in designs.index.get_level_values('Variable')
+      designs.index.unique('Variable')
       ).difference(
-        set(
-          ['Input', 'Input efficiency', 'Input price',
-          'Lifetime', 'Output efficiency', 'Output price', 'Scale']
-        )
+        set(_mandatory_vars)
       )
 
     if len(_des_var_set) != 0:
@@ -129,39 +574,34 @@ def check_tables(
         f'value(s).\n{_des_var_set}\n')
       )
 
-    # Designs check: Every Technology-Scenario combination must have
-    # the same Index levels within each mandatory Variable
     # Designs check: Every Technology-Scenario combination must have
     # all mandatory Variables
-    # Get a list of all Technology-Scenario combinations in Designs
-    _des_tecsce = list(set([i[:2] for i in designs.index.values]))    
-    # Get the set (no duplicates) of all Variable-Value combinations across 
-    # all Tech-Sce combinations
-    _var_val_set = set([i[2:] for i in designs.index.values])
-    for _j in _des_tecsce:
-      _des_tecsce_var_set = set([i[2] for i in designs.index.values if i[:2] == _j])
-      _des_tecsce_varval_set = set([i[2:] for i in designs.index.values if i[:2] == _j])
-      # Check if the Tech-Scen combo is missing any mandatory Variables
-      _odd_des_tecsce_var_set = set(
-        ['Input', 'Input efficiency', 'Input price',
-        'Lifetime', 'Output efficiency', 'Output price', 'Scale']
-        ).difference(
-          _des_tecsce_var_set
-        )
-      # Check if the Tech-Scen combo is missing any Variable Indexes
-      _odd_des_tecsce_varval_set = _var_val_set.difference(
-        _des_tecsce_varval_set
+    # Designs check: Every Technology-Scenario combination must have
+    # the same Index levels within each mandatory Variable
+    # Compare every Technology-Scenario combination in designs against all
+    # mandatory Variables and against the Variable-Index combinations found
+    # anywhere in designs.
+    _des_tecsce = _des_idx[['Technology', 'Scenario']].drop_duplicates()
+    _odd_des_tecsce_var = _missing(
+      _des_tecsce,
+      pd.DataFrame({'Variable': _mandatory_vars}),
+      _des_idx[['Technology', 'Scenario', 'Variable']],
+    )
+    for _j, _odd in _odd_des_tecsce_var.groupby(['Technology', 'Scenario']):
+      check_list.append(
+        (f'Data Validation: Technology-Scenario combination {_j} has '
+        f'missing mandatory Variables. Check in designs.\n{set(_odd.Variable)}\n')
+      )
+    _odd_des_tecsce_varval = _missing(
+      _des_tecsce,
+      _des_idx[['Variable', 'Index']].drop_duplicates(),
+      _des_idx[['Technology', 'Scenario', 'Variable', 'Index']],
+    )
+    for _j, _odd in _odd_des_tecsce_varval.groupby(['Technology', 'Scenario']):
+      check_list.append(
+        (f'Data Validation: Technology-Scenario combination {_j} has'
+        f' missing Variable Indexes. Check in designs.\n{set(zip(_odd.Variable, _odd.Index))}\n')
       )
-      if len(_odd_des_tecsce_var_set) != 0:
-        check_list.append(
-          (f'Data Validation: Technology-Scenario combination {_j} has '
-          f'missing mandatory Variables. Check in designs.\n{_odd_des_tecsce_var_set}\n')
-        )
-      if len(_odd_des_tecsce_varval_set) != 0:
-        check_list.append(
-          (f'Data Validation: Technology-Scenario combination {_j} has'
-          f' missing Variable Indexes. Check in designs.\n{_odd_des_tecsce_varval_set}\n')
-        )
 
     # Functions check: All unique entries under Model must be a .py file containing the
     # methods defined in the Capital, Fixed, Production, and Metrics columns
@@ -200,7 +640,7 @@ def check_tables(
     
     # Indices check: Type column contains exactly Capital, Input, Output, Metric
     _ind_type_odd = set(
-      [i[1] for i in indices.index.values]
+      indices.index.unique('Type')
       ).symmetric_difference(
         set(
           ['Capital', 'Input', 'Output', 'Metric']
@@ -221,16 +661,10 @@ def check_tables(
       )
     else:
       # Step 2: If all Offsets are integers, check for sequential values
-      _ind_val = indices.Offset.reset_index()
-      _ind_val_odd = [
-        set(
-          arange(len(_ind_val.Index[_ind_val.Type==_t]))
-        ).symmetric_difference(
-          set(_ind_val.Offset[_ind_val.Type==_t])
-        ) for _t in ['Capital', 'Input', 'Output', 'Metric']
+      _ind_off = indices.Offset[
+        _ind_idx.Type.isin(['Capital', 'Input', 'Output', 'Metric']).values
       ]
-
-      if any([len(i) for i in _ind_val_odd]) != 0:
+      if not _sequential(_ind_off, 'Type').all():
         check_list.append(
           (f'Data Validation: Check that Offset values in Indices are '
           'sequential integers beginning at zero, within each Type.\n')
@@ -240,19 +674,13 @@ def check_tables(
     # the Index values for Output Variable in results, and the Output 
     # efficiency (and Output price) Variable values in designs must be identical.
     _out_val_odd = [
-      set(
-        [i[2] for i in indices.index.values if i[1] == 'Output']
+      _values(_ind_idx, 'Index', 'Type', ['Output']
       ).symmetric_difference(
-        set(
-          [j[2] for j in results.index.values if j[1] == 'Output']
-        )
+        _values(_res_idx, 'Index', 'Variable', ['Output'])
       ),
-        set(
-          [j[2] for j in results.index.values if j[1] == 'Output']
+        _values(_res_idx, 'Index', 'Variable', ['Output']
         ).symmetric_difference(
-          set(
-            [k[3] for k in designs.index.values if k[2] in {'Output price','Output efficiency'}]
-          )
+          _values(_des_idx, 'Index', 'Variable', ['Output price', 'Output efficiency'])
         )
     ]
 
@@ -264,12 +692,9 @@ def check_tables(
 
     # Cross-check: The index values for Input Type in the indices dataset must match 
     # the Index values for Input, Input price, and Input efficiency Variable in designs.
-    _inp_val_odd = set(
-        [i[2] for i in indices.index.values if i[1] == 'Input']
+    _inp_val_odd = _values(_ind_idx, 'Index', 'Type', ['Input']
       ).symmetric_difference(
-        set(
-          [j[3] for j in designs.index.values if j[2] in {'Input', 'Input price', 'Input efficiency'}]
-        )
+        _values(_des_idx, 'Index', 'Variable', ['Input', 'Input price', 'Input efficiency'])
       )
     
     if len(_inp_val_odd) != 0:
@@ -285,22 +710,8 @@ def check_tables(
       check_list.append(
         (f'Data validation: Offset values in Parameters must be integers.\n')
       )
-    else:
-      # Step 2: If all Offsets are integers, check for sequential values
-      _par_off_val = parameters.Offset.reset_index()
-      _par_off_val_odd = list()
-      for _t in _par_off_val.Technology.unique().tolist():
-        for _s in _par_off_val.Scenario.unique().tolist():
-          _par_off_val_odd = _par_off_val_odd + \
-            [set(
-              arange(len(_par_off_val.Offset[(_par_off_val.Technology==_t) & (_par_off_val.Scenario==_s)]))
-              ).symmetric_difference(
-                set(
-                  _par_off_val.Offset[(_par_off_val.Technology==_t) & (_par_off_val.Scenario==_s)]
-                )
-              )
-            ]
-    if any([len(i) for i in _par_off_val_odd]) != 0:
+    # Step 2: If all Offsets are integers, check for sequential values
+    elif not _sequential(parameters.Offset, ['Technology', 'Scenario']).all():
       check_list.append(
         ('Data Validation: Check that Offset values in Parameters are '
         'sequential integers beginning at zero, within each Technology-Scenario '
@@ -309,48 +720,51 @@ def check_tables(
 
     # Parameters check: Every Parameter Offset must be the same across 
     # all Technology-Scenario combinations
-    # Get a list of all Technology-Scenario combinations in Parameters
-    parameters.sort_index(inplace=True)
-    _par_tecsce_paroff = [
-      parameters.loc[i,'Offset'] for i in list(
-        set([j[:2] for j in parameters.index.values])
+    # Summarize each Technology-Scenario combination by its sequence of
+    # Parameter-Offset pairs and compare the distinct summaries.
+    _par_off = parameters.Offset.sort_index()
+    _par_tecsce_paroff = _par_off.reset_index(
+      'Parameter'
+      ).groupby(
+        level=['Technology', 'Scenario']
+      ).agg(
+        tuple
+      )
+    _par_tecsce_paroff = (_par_tecsce_paroff.Parameter + _par_tecsce_paroff.Offset).drop_duplicates()
+    for _j in _par_tecsce_paroff.index[1:]:
+      check_list.append(
+        ('Data Validation: Parameter Offsets are inconsistent. Check '
+        f'in Parameters.\n{_par_off.loc[_j]}\n')
       )
-    ]
-    for _j in arange(len(_par_tecsce_paroff)):
-      if _j < len(_par_tecsce_paroff)-1:
-        if not _par_tecsce_paroff[_j].equals(_par_tecsce_paroff[_j+1]):
-          check_list.append(
-            ('Data Validation: Parameter Offsets are inconsistent. Check '
-            f'in Parameters.\n{_par_tecsce_paroff[_j]}\n')
-          )
     
     # Results check: Every Technology must have a result where both the Variable
     # and the Index are "Cost".
-    for _i in results.index.to_frame().Technology.unique():
-      if len([j[1:] for j in results.index if (j[1:] == ('Cost','Cost')) & (j[0] == _i)]) != 1:
-        check_list.append(
-          (f'Data Validation: Technology {_i} in Results needs a row where both '
-          'the Variable and the Index are "Cost".\n')
-        )
+    _res_cost = _res_idx.Technology[
+      (_res_idx.Variable == 'Cost') & (_res_idx.Index == 'Cost')
+      ].value_counts(
+      ).reindex(
+        _res_idx.Technology.unique(),
+        fill_value=0
+      )
+    for _i in _res_cost.index[_res_cost != 1]:
+      check_list.append(
+        (f'Data Validation: Technology {_i} in Results needs a row where both '
+        'the Variable and the Index are "Cost".\n')
+      )
     
     # Tranches check: Within every Category, the Amounts for each Tranche must be unique
-    _tra_amt_unique = [
-      tranches.groupby('Category').Amount.count()[i] != tranches.groupby('Category').Amount.nunique()[i] 
-      for i in arange(tranches.index.to_frame().Category.nunique())
-    ]
-    if any(_tra_amt_unique):
+    _tra_amt = tranches.groupby(level='Category').Amount.agg(['count', 'nunique'])
+    _tra_amt_unique = _tra_amt.index[_tra_amt['count'] != _tra_amt['nunique']]
+    if len(_tra_amt_unique) != 0:
       check_list.append(
-        (f'Data Validation: Category {tranches.index.to_frame().Category.unique()[_tra_amt_unique][0]}'
+        (f'Data Validation: Category {_tra_amt_unique[0]}'
         ' in Tranches has duplicate Amounts.\n')
       )
 
     # Cross-check: Metric Index values are identical in results and in indices
-    _met_odd_val = set(
-      [i[2] for i in indices.index.values if i[1] == 'Metric']
+    _met_odd_val = _values(_ind_idx, 'Index', 'Type', ['Metric']
       ).symmetric_difference(
-        set(
-          [j[2] for j in results.index.values if j[1] == 'Metric']
-        )
+        _values(_res_idx, 'Index', 'Variable', ['Metric'])
       )
     
     if len(_met_odd_val) != 0:
@@ -364,4 +778,3 @@ def check_tables(
       return False
     else:
       return True
-
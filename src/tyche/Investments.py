@@ -4,14 +4,15 @@ Investments in technologies.
 
 import os
 import sys
-import numpy  as np
-import pandas as pd
+import collections
+import numpy        as np
+import pandas       as pd
+import scipy.sparse as sp
 
-from .Distributions import parse_distribution
-from .IO            import check_tables
-from .DataManager   import TranchesDataset, InvestmentsDataset
-from .Designs       import sampler
-from .Types         import Evaluations
+from .Distributions import label_key, parse_distributions, sampler, seed_label, stream
+from .IO            import Workbook
+from .Statistics    import OnlineStatistics, choose_block_size
+from .Types         import Evaluations, Portfolios
 
 
 class Investments:
@@ -24,6 +25,8 @@ class Investments:
     The *tranches* table.
   investments: DataFrame
     The *investments* table.
+  scenario_results : OrderedDict
+    The results of seeded evaluations of the scenarios of designs, for each designs, sample count, sampling mode, and seed, from the least to the most recently used.
   """
   
   def __init__(
@@ -33,6 +36,9 @@ class Investments:
     uncertain   = False            ,
     tranches    = "tranches"   ,
     investments = "investments",
+    workbook    = None         ,
+    cache       = True         ,
+    memo_size   = 4            ,
   ):
     """
     Parameters
@@ -40,36 +46,174 @@ class Investments:
     path : str
       Path to directory where *tranches* and *investments* tables are saved.
     name : str
-      Filename where decision context datasets are kept in separate sheets.
+      Filename where decision context datasets are kept in separate sheets, or directory where they are kept in separate CSV, TSV, or Parquet files. If None, *path* is that directory.
     uncertain : Boolean
       Flag indicating whether probability distributions are present in the *tranches* table.
     tranches : str
       Sheet name for the *tranches* table.
     investments: str
       Sheet name for the *investments* table.
+    workbook : tyche.IO.Workbook
+      Session over the data file to share with other objects, such as *Designs*, so that its sheets are parsed only once.
+    cache : Boolean
+      Flag indicating whether to read and write the binary cache of the validated data file.
+    memo_size : int
+      The number of seeded evaluations of scenarios to keep for reuse.
     """
     self.uncertain = uncertain
+    self.memo_size = memo_size
+    self.scenario_results = collections.OrderedDict()
 
-    if not os.path.isfile(os.path.join(path, name)):
-      print(f"Investments: No input data found in {os.path.join(path, name)}")
+    fpath = path if name is None else os.path.join(path, name)
+    if not os.path.exists(fpath):
+      print(f"Investments: No input data found in {fpath}")
       sys.exit(1)
     else:
-      self._read(path, name, tranches, investments)
+      self._read(fpath, tranches, investments, workbook, cache)
   
-  def _read(self, path, name, tranches, investments):
-    if not check_tables(path, name):
+  def _read(self, fpath, tranches, investments, workbook=None, cache=True):
+    if workbook is None:
+      workbook = Workbook(fpath, cache=cache)
+    self.workbook = workbook
+
+    if not workbook.validate():
       print('Investments: Input datasets failed validation.')
       sys.exit(1)
     
-    self.tranches    = TranchesDataset(   fpath = os.path.join(path, name)).sort_index()
-    self.investments = InvestmentsDataset(fpath = os.path.join(path, name)).sort_index()
+    self.tranches    = workbook["tranches"   ].sort_index()
+    self.investments = workbook["investments"].sort_index()
 
   def compile(self):
     """Parse any probability distributions in the tranches."""
     self.compiled_tranches = self.tranches.copy()
-    self.compiled_tranches["Amount"] = self.compiled_tranches["Amount"].apply(parse_distribution)
+    self.compiled_tranches["Amount"] = parse_distributions(self.compiled_tranches["Amount"])
   
-  def evaluate_tranches(self, designs, sample_count=1):
+  def evaluate_scenarios(self, designs, sample_count=1, sampling="random", seed=None):
+    """
+    Evaluate the scenarios of designs, reusing the results of earlier calls.
+
+    Seeded results are computed once for each compilation of designs, sample
+    count, sampling mode, and seed, so `evaluate_tranches` and `evaluate_investments` share
+    the same samples; the `memo_size` most recently used are kept. Without a
+    seed, new samples are drawn on every call.
+    Only the scenarios referenced by the *tranches* table are evaluated.
+
+    Parameters
+    ----------
+    designs : tyche.Designs
+      The designs.
+    sample_count : int
+      The number of random samples.
+    sampling : str
+      How to sample the distributions: "random", "lhs", or "sobol".
+    seed : int or numpy.random.SeedSequence
+      Seed for reproducible sampling, or None to use numpy's global random state.
+    """
+    return self._memoize(
+      designs,
+      seed,
+      ("Scenarios", sample_count, sampling),
+      lambda: designs.evaluate_scenarios(
+        sample_count,
+        sampling,
+        seed,
+        scenarios=self.referenced_scenarios(),
+      ),
+    )
+
+  def evaluate_ensemble(self, designs, sample_count=1, sampling="random", seed=None):
+    """
+    Evaluate the scenarios of designs into dense arrays, reusing the results of earlier calls.
+
+    As in `evaluate_scenarios`, seeded results are reused, and only the scenarios referenced by the *tranches* table are evaluated.
+
+    Parameters
+    ----------
+    designs : tyche.Designs
+      The designs.
+    sample_count : int
+      The number of random samples.
+    sampling : str
+      How to sample the distributions: "random", "lhs", or "sobol".
+    seed : int or numpy.random.SeedSequence
+      Seed for reproducible sampling, or None to use numpy's global random state.
+
+    Returns
+    -------
+    tyche.Ensembles.Ensemble
+    """
+    return self._memoize(
+      designs,
+      seed,
+      ("Ensemble", sample_count, sampling),
+      lambda: designs.evaluate_ensemble(
+        sample_count,
+        sampling,
+        seed,
+        scenarios=self.referenced_scenarios(),
+      ),
+    )
+
+  def _memoize(self, designs, seed, key, evaluate):
+    # Reuse the results of seeded evaluations of designs, least recently used
+    # first out. The key includes how many times the designs were compiled and
+    # whether they are uncertain, so results are recomputed when either
+    # changes, and the designs are held with their results, so that their id
+    # is not reused while they are kept.
+    if seed is None or self.memo_size < 1:
+      return evaluate()
+    key = (id(designs), designs.compilations, designs.uncertain, seed_label(seed)) + key
+    if key in self.scenario_results and self.scenario_results[key][0] is designs:
+      self.scenario_results.move_to_end(key)
+    else:
+      self.scenario_results[key] = (designs, evaluate())
+      while len(self.scenario_results) > self.memo_size:
+        self.scenario_results.popitem(last=False)
+    return self.scenario_results[key][1]
+
+  def referenced_scenarios(self):
+    """
+    The scenarios referenced by the *tranches* table, which are the only ones evaluated.
+    """
+    return self.tranches.index.get_level_values("Scenario").unique()
+
+  def clear_scenarios(self):
+    """
+    Discard the results of evaluating scenarios.
+    """
+    self.scenario_results.clear()
+
+  def sample_amounts(self, sample_count=1, sampling="random", seed=None):
+    """
+    Sample the amounts of the tranches into an array.
+
+    Parameters
+    ----------
+    sample_count : int
+      The number of random samples.
+    sampling : str
+      How to sample the distributions: "random", "lhs", or "sobol".
+    seed : int or numpy.random.SeedSequence
+      Seed for reproducible sampling, or None to use numpy's global random state.
+
+    Returns
+    -------
+    tuple
+      The (category, tranche) labels and the float array of amounts indexed by (tranche, sample), summed over the scenarios of each tranche.
+    """
+    samples = sampler(
+      parse_distributions(self.tranches["Amount"]),
+      sample_count,
+      sampling,
+      stream(seed, "Tranches"),
+      np.array([label_key(*ix) for ix in self.tranches.index], dtype=np.uint64),
+    )
+    codes, tranches = pd.factorize(self.tranches.index.droplevel("Scenario"))
+    values = np.zeros((len(tranches), sample_count))
+    np.add.at(values, codes, samples)
+    return pd.MultiIndex.from_tuples(tranches, names=["Category", "Tranche"]), values
+
+  def evaluate_tranches(self, designs, sample_count=1, sampling="random", seed=None):
     """
     Evaluate the tranches of investment for a design.
 
@@ -79,50 +223,40 @@ class Investments:
       The designs.
     sample_count : int
       The number of random samples.
+    sampling : str
+      How to sample the distributions: "random", "lhs", or "sobol".
+    seed : int or numpy.random.SeedSequence
+      Seed for reproducible sampling, or None to use numpy's global random state.
     """
     # Parse any probability distributions in the tranches table
     self.compile()
 
-    # Check that only one of designs, investments contains uncertainty
-    if self.uncertain + designs.uncertain > 1:
-      print('Error: Remove probability distributions from tranche data OR from technology data.')
-      sys.exit(1)
+    # The metrics of a tranche are those of its scenarios, whether or not its
+    # amount is uncertain. If both the tranches and the designs are uncertain,
+    # their samples are paired along the shared Sample level.
+    metrics = self.tranches.drop(
+      columns=["Amount", "Notes"]
+    ).join(
+      self.evaluate_scenarios(designs, sample_count, sampling, seed).xs("Metric", level="Variable")
+    ).reorder_levels(
+      ["Category", "Tranche", "Scenario", "Sample", "Technology", "Index"]
+    )
 
     if self.uncertain:
-      self.compiled_tranches["Samples"] = pd.Series(
-        sampler(
-          self.compiled_tranches.Amount,
-          sample_count
-          ).tolist(),
-        index=self.compiled_tranches.index
-      )
-      samples = self.compiled_tranches.explode("Samples")
-      samples["Amount"] = samples["Samples"]
-      samples["Sample"] = pd.Series(
-        np.tile(
-          np.arange(sample_count)+1,
-          len(self.compiled_tranches.index)
+      tranches, values = self.sample_amounts(sample_count, sampling, seed)
+      # Build the long frame once from the (tranche, sample) array.
+      amounts = pd.DataFrame(
+        {
+          "Amount" : values.reshape(-1),
+        },
+        index=pd.MultiIndex.from_arrays(
+          [
+            np.repeat(tranches.get_level_values("Category"), sample_count),
+            np.repeat(tranches.get_level_values("Tranche" ), sample_count),
+            np.tile(np.arange(1, sample_count + 1), len(tranches))      ,
+          ],
+          names=["Category", "Tranche", "Sample"],
         ),
-        index=samples.index
-      )
-      samples.reset_index(
-        inplace=True
-      )
-      samples.set_index(
-        keys = ["Category", "Tranche", "Sample"],
-        inplace=True
-      )
-      amounts = samples.drop(
-        columns=["Samples", "Notes"]
-        ).sum(
-          level=["Category", "Tranche", "Sample"]
-      )
-      metrics = amounts.drop(
-        columns=["Amount"]
-      ).join(
-        designs.evaluate_scenarios(sample_count).xs("Metric", level="Variable")
-      ).reorder_levels(
-        ["Category", "Tranche", "Scenario", "Sample", "Technology", "Index"]
       )
 
     else:
@@ -137,13 +271,6 @@ class Investments:
       ).groupby(
         level=["Category", "Tranche"]
       ).sum()
-      metrics = self.compiled_tranches.drop(
-        columns=["Amount", "Notes"]
-      ).join(
-        designs.evaluate_scenarios(sample_count).xs("Metric", level="Variable")
-      ).reorder_levels(
-        ["Category", "Tranche", "Scenario", "Sample", "Technology", "Index"]
-      )
 
     return Evaluations(
       amounts = amounts,
@@ -160,7 +287,7 @@ class Investments:
       uncertain=self.uncertain,
     )
       
-  def evaluate_investments(self, designs, tranche_results=None, sample_count=1):
+  def evaluate_investments(self, designs, tranche_results=None, sample_count=1, sampling="random", seed=None):
     """
     Evaluate the investments for a design.
 
@@ -172,15 +299,28 @@ class Investments:
       Output of evaluate_tranches method. Necessary only if the investment amounts contain uncertainty.
     sample_count : int
       The number of random samples.
+    sampling : str
+      How to sample the distributions: "random", "lhs", or "sobol".
+    seed : int or numpy.random.SeedSequence
+      Seed for reproducible sampling, or None to use numpy's global random state.
     """
-    # Check that only one of designs, investments contains uncertainty
-    if self.uncertain + designs.uncertain > 1:
-      print('Error: Remove probability distributions from tranche data OR from technology data.')
-      sys.exit(1)
-    
+    # If both the tranches and the designs are uncertain, their samples are
+    # paired along the shared sample axis, as in evaluate_tranches.
     if not tranche_results:
-      tranche_results = self.evaluate_tranches(designs, sample_count)
+      tranche_results = self.evaluate_tranches(designs, sample_count, sampling, seed)
     
+    # The metrics of an investment are those of the scenarios of its tranches,
+    # whether or not the amounts are uncertain.
+    metrics = self.investments.drop(
+      columns=["Notes"]
+    ).join(
+      self.tranches.drop(columns=["Amount", "Notes"])
+    ).join(
+      self.evaluate_scenarios(designs, sample_count, sampling, seed).xs("Metric", level="Variable")
+    ).reorder_levels(
+      ["Investment", "Category", "Tranche", "Scenario", "Sample", "Technology", "Index"]
+    )
+
     # If the investment amounts (tranches) are uncertain, use the output of evaluate_tranches
     if self.uncertain:
       try:
@@ -188,15 +328,6 @@ class Investments:
       except AttributeError:
         print('Error: evaluate_investments requires output of evaluate_tranches')
         raise
-      metrics = self.investments.drop(
-        columns=["Notes"]
-      ).join(
-        amounts.drop(columns=["Amount"])
-      ).join(
-        designs.evaluate_scenarios(sample_count).xs("Metric", level="Variable")
-      ).reorder_levels(
-        ["Investment", "Category", "Tranche", "Scenario", "Sample", "Technology", "Index"]
-      )
     # If the investment amounts (tranches) are fixed, proceed as if the designs are uncertain
     else:
       amounts = self.investments.drop(
@@ -206,15 +337,6 @@ class Investments:
       ).groupby(
         level=["Investment"]
       ).sum()
-      metrics = self.investments.drop(
-        columns=["Notes"]
-      ).join(
-        self.tranches.drop(columns=["Amount", "Notes"])
-      ).join(
-        designs.evaluate_scenarios(sample_count).xs("Metric", level="Variable")
-      ).reorder_levels(
-        ["Investment", "Category", "Tranche", "Scenario", "Sample", "Technology", "Index"]
-      )
 
     return Evaluations(
       amounts = amounts,
@@ -230,3 +352,213 @@ class Investments:
       )[["Value", "Units"]],
       uncertain=self.uncertain
     )
+
+  def incidence_matrix(self, investments=None):
+    """
+    Make the sparse incidence matrix of investments and tranches.
+
+    Parameters
+    ----------
+    investments : DataFrame
+      Investments indexed by investment, category, and tranche, such as generated portfolios; by default, the *investments* table.
+
+    Returns
+    -------
+    tuple
+      The investment labels and the sparse matrix indexed by (investment, tranche), whose tranches are in the order of `sample_amounts`.
+    """
+    if investments is None:
+      investments = self.investments
+    tranches = self.tranches.index.droplevel("Scenario").unique()
+    rows, labels = pd.factorize(investments.index.get_level_values("Investment"))
+    columns = tranches.get_indexer(investments.index.droplevel("Investment"))
+    if np.any(columns < 0):
+      raise Exception("Investments: Investments reference tranches that are not in the tranches table.")
+    return labels, sp.csr_matrix(
+      (np.ones(len(rows)), (rows, columns)),
+      shape=(len(labels), len(tranches)),
+    )
+
+  def evaluate_portfolios(self, designs, incidence=None, investments=None, sample_count=1, sampling="random", seed=None):
+    """
+    Evaluate many investments at once, as arrays.
+
+    Each investment's metrics are the sum of the metrics of the scenarios of
+    its tranches, as in the summary of `evaluate_investments`, and are
+    computed as a sparse matrix product of the incidence matrix with the
+    metrics of the tranches.
+
+    Parameters
+    ----------
+    designs : tyche.Designs
+      The designs.
+    incidence : scipy.sparse matrix
+      The weight of each tranche, in the order of `sample_amounts`, in each investment; by default, that of the *investments* table.
+    investments : sequence
+      The labels of the rows of the incidence matrix; by default, their positions.
+    sample_count : int
+      The number of random samples.
+    sampling : str
+      How to sample the distributions: "random", "lhs", or "sobol".
+    seed : int or numpy.random.SeedSequence
+      Seed for reproducible sampling, or None to use numpy's global random state.
+
+    Returns
+    -------
+    tyche.Types.Portfolios
+      The investment labels, the (technology, index) labels and units of the metrics, the amounts indexed by (investment, sample), and the metrics indexed by (investment, metric, sample).
+    """
+    if incidence is None:
+      investments, incidence = self.incidence_matrix()
+    incidence = sp.csr_matrix(incidence)
+    if investments is None:
+      investments = np.arange(incidence.shape[0])
+
+    ensemble = self.evaluate_ensemble(designs, sample_count, sampling, seed)
+    # Fixed amounts are sampled once and broadcast along the sample axis.
+    _, amounts = self.sample_amounts(sample_count if self.uncertain else 1, sampling, seed)
+    amounts = np.broadcast_to(amounts, (amounts.shape[0], sample_count))
+    operator, metrics, units, keep = self._portfolio_operator(designs, incidence, ensemble)
+    values = operator @ self._scenario_metrics(ensemble, keep)
+
+    return Portfolios(
+      investments = investments,
+      metrics     = metrics,
+      units       = units,
+      amounts     = incidence @ amounts,
+      values      = np.asarray(values).reshape((incidence.shape[0], len(metrics), sample_count)),
+    )
+
+  def _portfolio_operator(self, designs, incidence, ensemble):
+    # The sparse matrix from the scenarios of an ensemble to the investments,
+    # and the labels, units, and mask of the metrics that are in the results.
+    tranches = self.tranches.index.droplevel("Scenario").unique()
+    rows = tranches.get_indexer(self.tranches.index.droplevel("Scenario"))
+    columns = pd.Index(ensemble.scenarios).get_indexer(self.tranches.index.get_level_values("Scenario"))
+    present = columns >= 0
+    scenarios = sp.csr_matrix(
+      (np.ones(np.sum(present)), (rows[present], columns[present])),
+      shape=(len(tranches), len(ensemble.scenarios)),
+    )
+    units = designs.results.xs("Metric", level="Variable")["Units"]
+    metrics = pd.MultiIndex.from_product(
+      [ensemble.technologies, ensemble.indices["Metric"]],
+      names=["Technology", "Index"],
+    )
+    keep = metrics.isin(units.index)
+    return incidence @ scenarios, metrics[keep], units.reindex(metrics[keep]).values, keep
+
+  def _scenario_metrics(self, ensemble, keep):
+    # The metrics of an ensemble indexed by (scenario, metric and sample);
+    # missing values count as zero, as in a groupby sum.
+    values = np.nan_to_num(
+      np.transpose(ensemble["Metric"], (1, 0, 3, 2))
+    ).reshape(
+      (len(ensemble.scenarios), len(keep), ensemble.sample_count)
+    )[:, keep, :]
+    return values.reshape((values.shape[0], -1))
+
+  def evaluate_nested(
+    self                              ,
+    designs                           ,
+    incidence      = None             ,
+    investments    = None             ,
+    outer_count    = 1                ,
+    inner_count    = 1                ,
+    block_size     = None             ,
+    memory_budget  = None             ,
+    quantiles      = (0.05, 0.5, 0.95),
+    reservoir_size = 1000             ,
+    sampling       = "random"         ,
+    seed           = None             ,
+  ):
+    """
+    Evaluate many investments with nested sampling of the tranche amounts and the designs.
+
+    For each of the outer samples of the tranche amounts, its own inner
+    samples of the designs are evaluated in blocks and folded into running
+    statistics of the investments' metrics, conditional on that outer sample.
+    Only one block of inner samples is held in memory at once, never the
+    outer-by-inner cross product.
+
+    Parameters
+    ----------
+    designs : tyche.Designs
+      The designs.
+    incidence : scipy.sparse matrix
+      The weight of each tranche, in the order of `sample_amounts`, in each investment; by default, that of the *investments* table.
+    investments : sequence
+      The labels of the rows of the incidence matrix; by default, their positions.
+    outer_count : int
+      The number of samples of the tranche amounts.
+    inner_count : int
+      The number of samples of the designs for each sample of the amounts.
+    block_size : int
+      The number of inner samples in each block.
+    memory_budget : int
+      The approximate number of bytes of results to hold at once, used to choose the block size when none is given. By default, blocks have 1000 samples.
+    quantiles : sequence of float
+      The probabilities of the quantiles of the metrics to estimate.
+    reservoir_size : int
+      The number of inner samples retained for each metric to estimate quantiles.
+    sampling : str
+      How to sample the distributions: "random", "lhs", or "sobol".
+    seed : int or numpy.random.SeedSequence
+      Seed for reproducible sampling, or None to use numpy's global random state.
+
+    Returns
+    -------
+    tyche.Types.Portfolios
+      The investment labels, the (technology, index) labels and units of the metrics, the amounts indexed by (investment, outer sample), and, as the values, a DataFrame of the statistics of each investment's metrics over the inner samples, indexed by investment, outer sample, technology, and index.
+    """
+    if incidence is None:
+      investments, incidence = self.incidence_matrix()
+    incidence = sp.csr_matrix(incidence)
+    if investments is None:
+      investments = np.arange(incidence.shape[0])
+
+    _, amounts = self.sample_amounts(outer_count, sampling, stream(seed, "Amounts"))
+
+    def evaluate(count, seed):
+      return designs.evaluate_ensemble(count, sampling, seed, scenarios=self.referenced_scenarios())
+
+    def footprint():
+      ensemble = evaluate(1, stream(seed, "Probe"))
+      _, metrics, _, _ = self._portfolio_operator(designs, incidence, ensemble)
+      return sum(values.nbytes for values in ensemble.values.values()) + 8 * incidence.shape[0] * len(metrics)
+
+    size = choose_block_size(inner_count, block_size, memory_budget, footprint)
+
+    operator  = None
+    summaries = []
+    for outer in range(outer_count):
+      statistics = OnlineStatistics(reservoir_size, stream(seed, "Reservoir", outer))
+      for block, start in enumerate(range(0, inner_count, size)):
+        count = min(size, inner_count - start)
+        ensemble = evaluate(count, stream(seed, "Outer", outer, "Block", block))
+        if operator is None:
+          operator, metrics, units, keep = self._portfolio_operator(designs, incidence, ensemble)
+        values = operator @ self._scenario_metrics(ensemble, keep)
+        statistics.update(np.asarray(values).reshape((incidence.shape[0], len(metrics), count)))
+      summaries.append(statistics.summarize(quantiles))
+
+    # Each summary has a row for each (investment, metric), in row-major order.
+    summary = pd.concat(summaries, ignore_index=True)
+    summary.index = pd.MultiIndex.from_arrays(
+      [
+        np.tile(np.repeat(np.asarray(investments, dtype=object), len(metrics)), outer_count),
+        np.repeat(np.arange(1, outer_count + 1), len(investments) * len(metrics))          ,
+        np.tile(metrics.get_level_values("Technology"), len(investments) * outer_count)    ,
+        np.tile(metrics.get_level_values("Index"     ), len(investments) * outer_count)    ,
+      ],
+      names=["Investment", "Outer", "Technology", "Index"],
+    )
+    summary["Units"] = np.tile(units, len(investments) * outer_count)
+
+    return Portfolios(
+      investments = investments,
+      metrics     = metrics,
+      units       = units,
+      amounts     = incidence @ amounts,
+      values      = summary.sort_index(level=["Investment", "Outer"], sort_remaining=False),
+    )
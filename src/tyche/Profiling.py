@@ -0,0 +1,182 @@
+"""
+Profiling of the stages of evaluations.
+"""
+
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+import numpy  as np
+import pandas as pd
+
+
+NO_PROFILE = contextlib.nullcontext()
+"""
+Reusable context manager for stages when profiling is disabled.
+"""
+
+
+def stored_bytes(array):
+  """
+  The bytes of memory an array refers to.
+
+  Axes with zero strides, as in the read-only views from `np.broadcast_to`,
+  repeat the same memory, so they are counted once.
+
+  Parameters
+  ----------
+  array : array
+    The array.
+  """
+  array = np.asarray(array)
+  if 0 in array.strides:
+    array = array[tuple(slice(0, 1) if stride == 0 else slice(None) for stride in array.strides)]
+  return array.nbytes
+
+
+class Profiler:
+  """
+  Recorder of the wall time, memory, and array shapes of evaluation stages.
+
+  Pass a profiler to `Designs` to record each stage of evaluating each
+  technology. Stages run in other processes, such as with `n_jobs`, are
+  recorded in the workers' copies of the profiler and are not collected.
+
+  Attributes
+  ----------
+  records : list of dict
+    The technology, stage, start and duration in seconds, bytes, and shapes of each stage.
+  trace_memory : Boolean
+    Whether bytes are the peak memory allocated during each stage, traced with `tracemalloc`, rather than the size of the stage's arrays.
+  """
+
+  def __init__(self, trace_memory=False):
+    """
+    Parameters
+    ----------
+    trace_memory : Boolean
+      Flag indicating whether to trace the peak memory allocated during each stage with `tracemalloc`, which slows evaluation; otherwise the size of each stage's arrays is recorded.
+    """
+    self.records      = []
+    self.trace_memory = trace_memory
+    self.origin       = time.perf_counter()
+
+  @contextlib.contextmanager
+  def stage(self, technology, name):
+    """
+    Record a stage.
+
+    Parameters
+    ----------
+    technology : str
+      The technology.
+    name : str
+      The stage.
+
+    Returns
+    -------
+    Context manager yielding the record, whose arrays can be added with `annotate`.
+    """
+    if self.trace_memory:
+      if not tracemalloc.is_tracing():
+        tracemalloc.start()
+      tracemalloc.reset_peak()
+      base, _ = tracemalloc.get_traced_memory()
+    record = {
+      "Technology" : technology,
+      "Stage"      : name      ,
+      "Start"      : 0.0       ,
+      "Duration"   : 0.0       ,
+      "Bytes"      : 0         ,
+      "Shapes"     : []        ,
+    }
+    start = time.perf_counter()
+    try:
+      yield record
+    finally:
+      record["Start"   ] = start - self.origin
+      record["Duration"] = time.perf_counter() - start
+      if self.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        record["Bytes"] = peak - base
+      self.records.append(record)
+
+  def annotate(self, record, *arrays):
+    """
+    Add the shapes and, unless memory is traced, the sizes of arrays to a record.
+
+    Parameters
+    ----------
+    record : dict
+      The record yielded by `stage`.
+    arrays : array or DataFrame
+      The arrays produced by the stage. Broadcast views, such as the samples of constants, count only the memory they refer to.
+    """
+    for array in arrays:
+      record["Shapes"].append(np.shape(array))
+      if not self.trace_memory:
+        if isinstance(array, (pd.DataFrame, pd.Series)):
+          record["Bytes"] += int(array.memory_usage(index=True).sum())
+        else:
+          record["Bytes"] += stored_bytes(array)
+
+  def clear(self):
+    """
+    Discard the records.
+    """
+    self.records = []
+    self.origin  = time.perf_counter()
+
+  def to_dict(self):
+    """
+    The records, as a list of dictionaries.
+    """
+    return [dict(record) for record in self.records]
+
+  def to_frame(self):
+    """
+    The records, as a DataFrame.
+    """
+    return pd.DataFrame(
+      self.records,
+      columns=["Technology", "Stage", "Start", "Duration", "Bytes", "Shapes"],
+    )
+
+  def to_chrome_trace(self, fpath=None):
+    """
+    The records, in the Chrome trace event format, for `chrome://tracing` or Perfetto.
+
+    Parameters
+    ----------
+    fpath : str
+      Location of a JSON file to write the trace to, if any.
+
+    Returns
+    -------
+    dict
+    """
+    pid = os.getpid()
+    trace = {
+      "traceEvents" : [
+        {
+          "name" : record["Stage"]          ,
+          "cat"  : "tyche"                  ,
+          "ph"   : "X"                      ,
+          "ts"   : record["Start"   ] * 1e6 ,
+          "dur"  : record["Duration"] * 1e6 ,
+          "pid"  : pid                      ,
+          "tid"  : str(record["Technology"]),
+          "args" : {
+            "bytes"  : int(record["Bytes"])                       ,
+            "shapes" : [list(shape) for shape in record["Shapes"]],
+          },
+        }
+        for record in self.records
+      ],
+      "displayTimeUnit" : "ms",
+    }
+    if fpath is not None:
+      with open(fpath, "w") as f:
+        json.dump(trace, f)
+    return trace
@@ -0,0 +1,199 @@
+"""
+Running statistics over blocks of samples.
+"""
+
+import numpy  as np
+import pandas as pd
+
+
+def choose_block_size(sample_count, size=None, memory_budget=None, probe=None, default=1000):
+  """
+  Choose the number of samples to evaluate in each block.
+
+  Parameters
+  ----------
+  sample_count : int
+    The total number of samples.
+  size : int
+    The requested block size, if any, which is used as is.
+  memory_budget : int
+    The approximate number of bytes to hold at once, if any.
+  probe : function
+    Function returning the bytes held for a single sample, called only when the block size is chosen from the memory budget. The footprint is doubled to allow for temporaries.
+  default : int
+    The block size when neither a size nor a memory budget is given.
+  """
+  if size is None:
+    size = default
+    if memory_budget is not None:
+      size = int(memory_budget // (2 * probe()))
+  return max(1, min(size, sample_count))
+
+
+class OnlineStatistics:
+  """
+  Running statistics for arrays of cells whose last axis is the sample.
+
+  Blocks of samples are folded into the count, mean, sum of squared
+  deviations, minimum, and maximum of each cell using Chan's parallel
+  update, so the statistics are exact however the samples are blocked.
+  Quantiles are estimated from a uniform reservoir of samples for each
+  cell; they are exact while no more than `reservoir_size` samples have
+  been seen.
+
+  Attributes
+  ----------
+  count : int
+    The number of samples seen for each cell.
+  mean : array
+    The mean of each cell.
+  m2 : array
+    The sum of squared deviations from the mean of each cell.
+  minimum : array
+    The minimum of each cell.
+  maximum : array
+    The maximum of each cell.
+  reservoir : array
+    The retained samples for each cell.
+  """
+
+  def __init__(self, reservoir_size=1000, random_state=None):
+    """
+    Parameters
+    ----------
+    reservoir_size : int
+      The number of samples retained for each cell to estimate quantiles.
+    random_state : int or numpy.random.SeedSequence
+      Seed for choosing which samples to retain.
+    """
+    self.reservoir_size = reservoir_size
+    self.rng            = np.random.default_rng(random_state)
+    self.count          = 0
+    self.mean           = None
+    self.m2             = None
+    self.minimum        = None
+    self.maximum        = None
+    self.reservoir      = None
+
+  def update(self, block):
+    """
+    Fold a block of samples into the statistics.
+
+    Parameters
+    ----------
+    block : array
+      The samples, with the sample along the last axis.
+    """
+    m = block.shape[-1]
+    if m == 0:
+      return
+    mean = np.mean(block, axis=-1)
+    m2   = np.sum(np.square(block - mean[..., np.newaxis]), axis=-1)
+    if self.count == 0:
+      self.mean    = mean
+      self.m2      = m2
+      self.minimum = np.min(block, axis=-1)
+      self.maximum = np.max(block, axis=-1)
+    else:
+      n = self.count + m
+      delta = mean - self.mean
+      self.mean    = self.mean + delta * (m / n)
+      self.m2      = self.m2 + m2 + np.square(delta) * (self.count * m / n)
+      self.minimum = np.minimum(self.minimum, np.min(block, axis=-1))
+      self.maximum = np.maximum(self.maximum, np.max(block, axis=-1))
+    self._sample(block)
+    self.count += m
+
+  def _sample(self, block):
+    # Reservoir sampling, with the same retained positions for every cell:
+    # each cell still holds a uniform sample of its own values.
+    m = block.shape[-1]
+    kept = 0 if self.reservoir is None else self.reservoir.shape[-1]
+    fill = min(self.reservoir_size - kept, m)
+    if fill > 0:
+      head = np.array(block[..., :fill])
+      self.reservoir = head if self.reservoir is None else np.concatenate([self.reservoir, head], axis=-1)
+    if fill < m:
+      seen = self.count + np.arange(fill, m)
+      slots = self.rng.integers(0, seen + 1)
+      replace = slots < self.reservoir_size
+      self.reservoir[..., slots[replace]] = block[..., fill:][..., replace]
+
+  @property
+  def variance(self):
+    """
+    The sample variance of each cell.
+    """
+    if self.count < 2:
+      return np.full_like(self.mean, np.nan)
+    return self.m2 / (self.count - 1)
+
+  def quantile(self, q):
+    """
+    Estimate quantiles of each cell.
+
+    Parameters
+    ----------
+    q : float or sequence of float
+      The probabilities of the quantiles.
+
+    Returns
+    -------
+    array
+      The quantiles, with the probability along the first axis for a sequence of probabilities.
+    """
+    return np.quantile(self.reservoir, q, axis=-1)
+
+  def interval(self, statistic="mean", z=1.959963984540054):
+    """
+    Estimate a statistic of each cell, with the half-width of its confidence interval.
+
+    The interval for the mean is from the normal approximation. The interval
+    for a quantile is from the normal approximation to the binomial
+    distribution of the retained samples below it, so it does not narrow
+    once the reservoir is full.
+
+    Parameters
+    ----------
+    statistic : str or float
+      Either "mean" or the probability of a quantile.
+    z : float
+      The standard normal quantile for the confidence level, such as 1.96 for 95% confidence.
+
+    Returns
+    -------
+    tuple of arrays
+      The estimate and half-width for each cell.
+    """
+    if statistic == "mean":
+      return self.mean, z * np.sqrt(self.variance / self.count)
+    n = self.reservoir.shape[-1]
+    d = z * np.sqrt(statistic * (1 - statistic) / n)
+    lower, estimate, upper = self.quantile([max(statistic - d, 0), statistic, min(statistic + d, 1)])
+    return estimate, (upper - lower) / 2
+
+  def summarize(self, quantiles=(0.05, 0.5, 0.95)):
+    """
+    Summarize the statistics of each cell as columns.
+
+    Parameters
+    ----------
+    quantiles : sequence of float
+      The probabilities of the quantiles to report.
+
+    Returns
+    -------
+    DataFrame
+      The count, mean, variance, minimum, maximum, and quantiles, with one row for each cell in row-major order.
+    """
+    columns = {
+      "Count"    : np.full(self.mean.size, self.count),
+      "Mean"     : self.mean.ravel()                  ,
+      "Variance" : self.variance.ravel()              ,
+      "Min"      : self.minimum.ravel()               ,
+      "Max"      : self.maximum.ravel()               ,
+    }
+    if len(quantiles) > 0:
+      for q, values in zip(quantiles, self.quantile(list(quantiles))):
+        columns[f"Q{q:g}"] = values.ravel()
+    return pd.DataFrame(columns)
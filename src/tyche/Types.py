@@ -40,6 +40,26 @@ Named tuple type for rows in the *results* table.
 """
 
 
+Gather = namedtuple("Gather", [
+  "positions",
+  "keys"     ,
+])
+"""
+Named tuple type for the positions and random-stream keys of the cells of an array in a flat array of distributions.
+"""
+
+
+Plan = namedtuple("Plan", [
+  "scenarios" ,
+  "indices"   ,
+  "designs"   ,
+  "parameters",
+])
+"""
+Named tuple type for the precomputed vectorization of a technology.
+"""
+
+
 Functions = namedtuple("Functions", [
   "style"     ,
   "capital"   ,
@@ -63,6 +83,18 @@ Named tuple type for rows in the *evaluations* table.
 """
 
 
+Portfolios = namedtuple("Portfolios", [
+  "investments",
+  "metrics"    ,
+  "units"      ,
+  "amounts"    ,
+  "values"     ,
+])
+"""
+Named tuple type for the array-backed evaluation of many investments.
+"""
+
+
 SynthesizedDistribution = namedtuple("SynthesizedDistribution", [
   "rvs",
 ])